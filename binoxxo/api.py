@@ -0,0 +1,247 @@
+"""
+BinOXXO Program Solver
+
+Library entry point: solves an in-memory grid with any backend and
+returns a Result, without printing, exiting or spawning a process.
+
+    from api import solve
+    result = solve(grid, backend="cp-sat", options={"model": "bool"})
+"""
+
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+import numpy as np
+
+import stats
+from tools import parse_grid, to_np, uniqueness
+
+BACKENDS = ["native", "cp-sat", "z3"]
+
+DEFAULTS = {
+    # native search
+    "prefill": False,
+    "engine": "rows",
+    "order": "row",
+    # CP-SAT and Z3 models
+    "model": "int",
+    "workers": 0,
+    "time_limit": None,
+    "hint": False,
+    # build the model once per grid size, see binoxxo_or.Template and
+    # binoxxo_z3.Session, not with hint
+    "template": False,
+    # count the solutions up to this cap, 0 for all, instead of solving
+    "count": None,
+    # collect the statistics of the search into Result.stats
+    "stats": False,
+    # a cache.SolutionCache answering known grids, up to symmetry
+    "cache": None,
+}
+
+
+@dataclass
+class Result:
+    """Outcome of solve().
+
+    status is solved, unsolvable, invalid (the clues break a rule) or
+    unknown (time limit); when counting it is none, unique or multiple
+    and solutions holds the number found. Times are in seconds, with a
+    template build_time is the setup of the clues of this grid. stats
+    holds the counters of the search when asked for. cached tells
+    whether the solution came from the cache."""
+
+    status: str
+    backend: str
+    solution: list[list[str]] | None = None
+    solutions: int | None = None
+    prefilled: int = 0
+    build_time: float = 0.0
+    solve_time: float = 0.0
+    nodes: int = 0
+    stats: dict | None = None
+    cached: bool = False
+
+
+def as_grid(grid: list[list[str]] | np.ndarray | str) -> list[list[str]]:
+    """Return the grid as read by Grider, from a text in the format of the
+    puzzle files, a list of rows or an array. Raise ValueError if it is
+    not a square grid of o, x and empty cells."""
+
+    if isinstance(grid, str):
+        return parse_grid(grid)
+    if any(len(row) != len(grid) for row in grid):
+        raise ValueError("the grid is not square")
+    return parse_grid(
+        "\n".join("".join(c if c in ("o", "x") else "-" for c in row) for row in grid)
+    )
+
+
+def with_defaults(options: dict | None) -> dict:
+    """Return the options over DEFAULTS. Raise ValueError for a hint asked
+    with a template: templates are built without the clues, the
+    heuristics cannot hint them."""
+
+    options = {**DEFAULTS, **(options or {})}
+    if options["template"] and options["hint"]:
+        raise ValueError("hint does not apply to templates")
+    return options
+
+
+def solve(
+    grid: list[list[str]] | np.ndarray | str,
+    backend: str = "native",
+    options: dict | None = None,
+) -> Result:
+    """Solve a grid, or count its solutions, with one backend.
+
+    options override DEFAULTS, the grid is left unchanged. Raise
+    ValueError for an unknown backend, a grid that is not square or a
+    hint asked with a template."""
+
+    import binoxxo
+
+    if backend not in BACKENDS:
+        raise ValueError(f"unknown backend {backend}")
+    options = with_defaults(options)
+    grid = as_grid(grid)
+    if options["stats"]:
+        stats.enable()
+        stats.reset()
+
+    # only the grids solved or proven unsolvable are cached, so a hit is
+    # valid
+    cache = options["cache"] if options["count"] is None else None
+    if cache is not None:
+        start = time.perf_counter()
+        found, sol = cache.get(grid)
+        if found:
+            status = "unsolvable" if sol is None else "solved"
+            return Result(
+                status,
+                backend,
+                sol,
+                solve_time=time.perf_counter() - start,
+                cached=True,
+            )
+
+    if not binoxxo.grid_is_valid(to_np(grid)):
+        return Result("invalid", backend)
+
+    result = SOLVERS[backend](grid, options)
+    if cache is not None and result.status in ("solved", "unsolvable"):
+        cache.put(grid, result.solution)
+    return result
+
+
+def solve_native(grid: list[list[str]], options: dict) -> Result:
+    import binoxxo
+    import bitboard
+    import rowsearch
+    from heuristics import heuristics
+
+    result = Result("unsolvable", "native")
+    engine = options["engine"]
+    start = time.perf_counter()
+    g = to_np(grid)
+    if options["prefill"]:
+        result.prefilled = heuristics(g)
+    result.build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if options["count"] is not None:
+        # prefilling may run into a contradiction
+        nb = 0
+        if binoxxo.grid_is_valid(g):
+            nb = binoxxo.count_solutions(g, options["count"])
+            result.nodes = rowsearch.nodes
+        result.status, result.solutions = uniqueness(nb), nb
+        engine = "rows"
+    elif binoxxo.grid_is_valid(g):
+        if not binoxxo.grid_full(g):
+            g = binoxxo.search(g, engine, options["order"])
+            engines = {"numpy": binoxxo, "bitboard": bitboard, "rows": rowsearch}
+            result.nodes = engines[engine].nodes
+        if g is not None:
+            result.status, result.solution = "solved", g.tolist()
+    result.solve_time = time.perf_counter() - start
+    if options["stats"]:
+        result.stats = stats.native(engine)
+    return result
+
+
+@lru_cache
+def cp_sat_template(n: int, model: str, workers: int, time_limit: float | None):
+    """Return the CP-SAT template for these settings, built once."""
+    import binoxxo_or
+
+    return binoxxo_or.Template(n, model, workers, time_limit)
+
+
+@lru_cache
+def z3_session(n: int, model: str):
+    """Return the Z3 session of side n, built once."""
+    import binoxxo_z3
+
+    return binoxxo_z3.Session(n, model)
+
+
+def solve_cp_sat(grid: list[list[str]], options: dict) -> Result:
+    import binoxxo_or
+
+    if options["template"]:
+        solver = cp_sat_template(
+            len(grid), options["model"], options["workers"], options["time_limit"]
+        )
+        return model_result("cp-sat", solver, (grid,), options, "INFEASIBLE")
+    solver = binoxxo_or.BinOXXO(
+        grid,
+        model=options["model"],
+        workers=options["workers"],
+        time_limit=options["time_limit"],
+        hint=options["hint"],
+    )
+    return model_result("cp-sat", solver, (), options, "INFEASIBLE")
+
+
+def solve_z3(grid: list[list[str]], options: dict) -> Result:
+    import binoxxo_z3
+
+    if options["template"]:
+        solver = z3_session(len(grid), options["model"])
+        return model_result("z3", solver, (grid,), options, "unsat")
+    solver = binoxxo_z3.BinOXXO(grid, model=options["model"])
+    return model_result("z3", solver, (), options, "unsat")
+
+
+def model_result(
+    backend: str, solver, args: tuple, options: dict, infeasible: str
+) -> Result:
+    """Solve or count with a BinOXXO, a Template or a Session, args holds
+    the grid for the latter two. Collect the outcome."""
+
+    result = Result("unknown", backend)
+    if options["count"] is not None:
+        # None when the time limit stopped the enumeration early
+        nb = solver.count(*args, options["count"])
+        if nb is not None:
+            result.status, result.solutions = uniqueness(nb), nb
+    else:
+        msg, sol = solver.solution(*args)
+        if sol:
+            result.status, result.solution = "solved", sol
+        elif msg == infeasible:
+            result.status = "unsolvable"
+    # templates and sessions are built once, report the setup of this puzzle
+    result.build_time = getattr(solver, "setup_time", None)
+    if result.build_time is None:
+        result.build_time = getattr(solver, "build_time", 0.0)
+    result.solve_time = solver.wall_time
+    result.nodes = getattr(solver, "nodes", 0)
+    if options["stats"]:
+        result.stats = solver.statistics()
+    return result
+
+
+SOLVERS = {"native": solve_native, "cp-sat": solve_cp_sat, "z3": solve_z3}
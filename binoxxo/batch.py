@@ -0,0 +1,201 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Solves many puzzles with a process pool and writes one JSON line per puzzle.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from functools import lru_cache
+from multiprocessing import Pool
+
+import api
+from api import BACKENDS
+from corpus import SUFFIX, Corpus
+from tools import Grider
+
+
+def puzzle_files(inputs: list[str], lists: list[str]) -> list[str]:
+    """Expand directories, glob patterns and list files into puzzle files.
+    A corpus file stands for its puzzles, named corpus.boxx:i."""
+
+    files = []
+    for name in inputs:
+        if os.path.isdir(name):
+            files += sorted(glob.glob(os.path.join(name, "*.txt")))
+        elif glob.has_magic(name):
+            files += sorted(glob.glob(name))
+        else:
+            files.append(name)
+
+    # a list file holds one puzzle file per line, comments are allowed
+    for name in lists:
+        with open(name) as f:
+            files += [
+                line.strip()
+                for line in f
+                if not line.startswith("#") and not line.isspace()
+            ]
+
+    names = []
+    for f in files:
+        if f.endswith(SUFFIX):
+            names += [f"{f}:{i}" for i in range(len(open_corpus(f)))]
+        else:
+            names.append(f)
+    return names
+
+
+@lru_cache
+def open_corpus(filename: str) -> Corpus:
+    """Map a corpus once per process, the workers share its pages."""
+    return Corpus(filename)
+
+
+def load_grid(name: str) -> list[list[str]]:
+    """Read a puzzle file, or the puzzle i of a corpus named corpus.boxx:i."""
+
+    filename, _, index = name.rpartition(":")
+    if filename.endswith(SUFFIX) and index.isdigit():
+        return open_corpus(filename).grid(int(index))
+    return Grider(name).grid
+
+
+def load_backend(backend: str) -> None:
+    """Import the backend once per worker, outside of the timed solves."""
+    import importlib
+
+    importlib.import_module(MODULES[backend])
+
+
+MODULES = {"native": "binoxxo", "cp-sat": "binoxxo_or", "z3": "binoxxo_z3"}
+
+
+def solve_file(task: tuple[str, str, dict]) -> dict:
+    """Solve one puzzle file in a worker, return its record."""
+
+    filename, backend, options = task
+    start = time.perf_counter()
+    try:
+        result = api.solve(load_grid(filename), backend, options)
+    except Exception as err:
+        result, error = api.Result("error", backend), str(err)
+    else:
+        error = None
+    sol = result.solution
+    record = {
+        "file": filename,
+        "backend": backend,
+        "status": result.status,
+        "solution": ["".join(row) for row in sol] if sol else None,
+        "time": round(time.perf_counter() - start, 6),
+        "build_time": round(result.build_time, 6),
+        "solve_time": round(result.solve_time, 6),
+    }
+    if result.solutions is not None:
+        record["solutions"] = result.solutions
+    if result.stats is not None:
+        record["stats"] = result.stats
+    if error:
+        record["error"] = error
+    return record
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "inputs", nargs="*", help="puzzle files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        action="append",
+        default=[],
+        help="file listing one puzzle file per line",
+    )
+    parser.add_argument("-b", "--backend", choices=BACKENDS, default="native")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="number of processes"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, help="JSON lines output file, default stdout"
+    )
+    parser.add_argument(
+        "-p", "--prefill", action="store_true", help="use heuristics to prefill"
+    )
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=int,
+        nargs="?",
+        const=2,
+        help="count the solutions, stopping at COUNT (default 2, 0 for all)",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["numpy", "bitboard", "rows"],
+        default="rows",
+        help="grid representation used by the native search",
+    )
+
+    parser.add_argument(
+        "-m",
+        "--model",
+        choices=["int", "bool"],
+        default="int",
+        help="cell variables of the CP-SAT or Z3 model",
+    )
+    parser.add_argument(
+        "-t",
+        "--template",
+        action="store_true",
+        help="build the CP-SAT or Z3 model once per grid size and worker",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="add the search statistics to records"
+    )
+
+    args = parser.parse_intermixed_args()
+
+    files = puzzle_files(args.inputs, args.list)
+    options = {
+        "prefill": args.prefill,
+        "engine": args.engine,
+        "count": args.count,
+        "model": args.model,
+        "template": args.template,
+        "stats": args.stats,
+    }
+    tasks = [(f, args.backend, options) for f in files]
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    start = time.perf_counter()
+    solved = 0
+    with Pool(args.jobs, load_backend, (args.backend,)) as pool:
+        chunksize = max(1, len(tasks) // (4 * args.jobs))
+        for record in pool.imap_unordered(solve_file, tasks, chunksize):
+            solved += record["status"] in ("solved", "unique")
+            out.write(json.dumps(record) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+    print(
+        f"solved {solved}/{len(tasks)} puzzles in "
+        f"{time.perf_counter() - start:.3f} s with {args.backend}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
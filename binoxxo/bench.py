@@ -0,0 +1,249 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Benchmarks the backends over the puzzles in data/ and generated puzzles.
+
+Every run records the wall time, the model-build and solve times, the
+search nodes and the peak memory growth of the worker process. Results
+are written as JSON and can be compared against a saved baseline.
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from multiprocessing import Pool
+
+from batch import load_backend
+from tools import Grider, save_grid
+
+BACKENDS = ["native", "native-prefill", "cp-sat", "z3"]
+
+
+def generate_puzzle(n: int, density: float, rng: random.Random) -> list[list[str]]:
+    """Return a random solved grid of side n keeping a share of its cells."""
+
+    import bitboard
+    import rowsearch
+
+    bg = bitboard.BitGrid(n)
+    rowsearch.solve_grid(bg, rng)
+    grid = bg.to_np().tolist()
+    for i in range(n):
+        for j in range(n):
+            if rng.random() >= density:
+                grid[i][j] = ""
+    return grid
+
+
+def build_corpus(
+    directory: str, sizes: list[int], densities: list[float], count: int, seed: int
+) -> list[str]:
+    """Write generated puzzles to directory, return their file names."""
+
+    rng = random.Random(seed)
+    files = []
+    for n in sizes:
+        for density in densities:
+            for k in range(count):
+                name = os.path.join(directory, f"gen_{n}_{density:.2f}_{k}.txt")
+                comment = f"generated n={n} density={density} seed={seed}"
+                save_grid(name, generate_puzzle(n, density, rng), comment)
+                files.append(name)
+    return files
+
+
+def run(task: tuple[str, str, dict]) -> dict:
+    """Run one backend on one puzzle, in a fresh worker process."""
+
+    filename, backend, options = task
+    n = len(Grider(filename).grid)
+    record = {"puzzle": os.path.basename(filename), "n": n, "backend": backend}
+
+    # import the backend so the import is not counted, then take the
+    # baseline before any solve: the high-water mark of the process is
+    # reached by the first solve, which builds the tables and models
+    load_backend("native" if backend == "native-prefill" else backend)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    run_one(filename, backend, options)
+
+    best = None
+    for _ in range(options["repeat"]):
+        start = time.perf_counter()
+        result = run_one(filename, backend, options)
+        result["wall"] = time.perf_counter() - start
+        if best is None or result["wall"] < best["wall"]:
+            best = result
+    best["peak_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss
+    return {**record, **best}
+
+
+def run_one(filename: str, backend: str, options: dict) -> dict:
+    import api
+
+    grid = Grider(filename).grid
+    if backend == "native-prefill":
+        result = api.solve(grid, "native", {**options, "prefill": True})
+    else:
+        result = api.solve(grid, backend, options)
+    return {
+        "status": result.status,
+        "build": result.build_time,
+        "solve": result.solve_time,
+        "nodes": result.nodes,
+    }
+
+
+def compare(results: list[dict], baseline: list[dict], args) -> int:
+    """Print the runs slower than the baseline, return their number."""
+
+    previous = {(r["puzzle"], r["backend"]): r for r in baseline}
+    regressions = 0
+    for r in results:
+        old = previous.get((r["puzzle"], r["backend"]))
+        if old is None or "wall" not in r or "wall" not in old:
+            continue
+        if (
+            r["wall"] > old["wall"] * args.threshold
+            and r["wall"] - old["wall"] > args.min_delta
+        ):
+            regressions += 1
+            print(
+                f"regression {r['backend']:>14} {r['puzzle']}: "
+                f"{old['wall']:.4f} s -> {r['wall']:.4f} s",
+                file=sys.stderr,
+            )
+        if r["status"] != old["status"]:
+            regressions += 1
+            print(
+                f"status change {r['backend']:>14} {r['puzzle']}: "
+                f"{old['status']} -> {r['status']}",
+                file=sys.stderr,
+            )
+    return regressions
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-b", "--backend", choices=BACKENDS, action="append", help="default: all"
+    )
+    parser.add_argument(
+        "-d", "--data", type=str, default="data", help="directory of puzzles"
+    )
+    parser.add_argument(
+        "-s",
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=[6, 8, 10, 12, 14],
+        help="sizes of the generated puzzles",
+    )
+    parser.add_argument(
+        "--densities",
+        type=float,
+        nargs="*",
+        default=[0.2, 0.35, 0.5],
+        help="share of clues of the generated puzzles",
+    )
+    parser.add_argument(
+        "-n", "--count", type=int, default=2, help="generated puzzles per setting"
+    )
+    parser.add_argument("--seed", type=int, default=1, help="generator seed")
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="runs per puzzle, best is kept"
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["numpy", "bitboard", "rows"],
+        default="rows",
+        help="grid representation used by the native search",
+    )
+    parser.add_argument(
+        "--order",
+        choices=["row", "mcv"],
+        default="row",
+        help="cell order of the numpy search",
+    )
+    parser.add_argument(
+        "-m",
+        "--model",
+        choices=["int", "bool"],
+        default="int",
+        help="cell variables of the CP-SAT and Z3 models",
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="processes")
+    parser.add_argument(
+        "-o", "--output", type=str, default="bench.json", help="results file"
+    )
+    parser.add_argument("-c", "--compare", type=str, help="baseline results file")
+    parser.add_argument(
+        "--threshold", type=float, default=1.25, help="slowdown ratio flagged"
+    )
+    parser.add_argument(
+        "--min-delta", type=float, default=0.005, help="slowdown in s ignored"
+    )
+
+    args = parser.parse_args()
+
+    backends = args.backend or BACKENDS
+    options = {
+        "engine": args.engine,
+        "order": args.order,
+        "model": args.model,
+        "repeat": args.repeat,
+    }
+
+    with tempfile.TemporaryDirectory() as directory:
+        files = sorted(glob.glob(os.path.join(args.data, "*.txt")))
+        files += build_corpus(
+            directory, args.sizes, args.densities, args.count, args.seed
+        )
+        tasks = [(f, b, options) for f in files for b in backends]
+
+        # a fresh process per run keeps the peak memory meaningful
+        with Pool(args.jobs, maxtasksperchild=1) as pool:
+            results = pool.map(run, tasks, chunksize=1)
+
+    for r in results:
+        if "wall" in r:
+            print(
+                f"{r['backend']:>14} {r['puzzle']:32} {r['status']:>10} "
+                f"{r['wall']:8.4f} s {r['nodes']:>9} nodes {r['peak_kb']:>7} kB"
+            )
+
+    with open(args.output, "w") as f:
+        meta = {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "engine": args.engine,
+            "order": args.order,
+            "model": args.model,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        json.dump({"meta": meta, "results": results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -7,40 +7,48 @@ Uses rules and brute-force approach.
 """
 
 import argparse
+import json
 from tools import Grider
-from heuristics import heuristics, SIDE
+import bitboard
+import rowsearch
 
 
 import numpy as np
 
 verbose_on = False
 
+# search statistics of the last search: nodes visited, assignments undone
+# and deepest level reached
+nodes = backtracks = max_depth = 0
+
 
 def grid_is_valid(grid: np.ndarray) -> bool:
     """Check for valid grid."""
 
-    # cannot have more 5 symbols per row/column
+    n = grid.shape[0]
+
+    # cannot have more than n/2 symbols per row/column
     for i in [0, 1]:
-        xs = (np.count_nonzero(grid == "x", axis=i) > 5).any()
-        os = (np.count_nonzero(grid == "o", axis=i) > 5).any()
+        xs = (np.count_nonzero(grid == "x", axis=i) > n // 2).any()
+        os = (np.count_nonzero(grid == "o", axis=i) > n // 2).any()
         if xs or os:
             return False
 
     # cannot have more than 3 consecutive symbols per row/column
     os = ["o", "o", "o"]
     xs = ["x", "x", "x"]
-    for i in range(SIDE):
-        for j in range(SIDE - 2):
+    for i in range(n):
+        for j in range(n - 2):
             if (grid[i, j : j + 3] == xs).all() or (grid[i, j : j + 3] == os).all():
                 return False
-    for j in range(SIDE):
-        for i in range(SIDE - 2):
+    for j in range(n):
+        for i in range(n - 2):
             if (grid[i : i + 3, j] == xs).all() or (grid[i : i + 3, j] == os).all():
                 return False
 
     # cannot have two identical rows/columns, but only when they are full!
-    for i in range(SIDE - 1):
-        for j in range(i + 1, SIDE):
+    for i in range(n - 1):
+        for j in range(i + 1, n):
             if (
                 grid_full(grid[i, :])
                 and grid_full(grid[j, :])
@@ -48,8 +56,8 @@ def grid_is_valid(grid: np.ndarray) -> bool:
             ):
                 # print(f"identical rows {i},{j}")
                 return False
-    for i in range(SIDE - 1):
-        for j in range(i + 1, SIDE):
+    for i in range(n - 1):
+        for j in range(i + 1, n):
             if (
                 grid_full(grid[:, i])
                 and grid_full(grid[:, j])
@@ -69,53 +77,236 @@ def empty_index(grid: np.ndarray) -> list[list[int, int]]:
     return np.argwhere(grid == "")
 
 
-def solve_grid(grid: np.ndarray, empty_list: np.ndarray) -> bool:
-    """Entry point to the recursive solver."""
+def line_is_valid(line: np.ndarray) -> bool:
+    """Check the balance and triple rules on a single row or column."""
+
+    s = "".join(c or "-" for c in line.tolist())
+    if s.count("x") > len(s) // 2 or s.count("o") > len(s) // 2:
+        return False
+    return "xxx" not in s and "ooo" not in s
+
+
+def completed_lines(grid: np.ndarray) -> tuple[set[str], set[str]]:
+    """Return the full rows and the full columns as sets of strings."""
+    rows = {"".join(r) for r in grid.tolist() if "" not in r}
+    cols = {"".join(c) for c in grid.T.tolist() if "" not in c}
+    return rows, cols
+
+
+def placement_is_valid(
+    grid: np.ndarray, i: int, j: int, rows: set[str], cols: set[str]
+) -> bool:
+    """Check the row and column of the cell (i, j) just set, and its full
+    lines against the completed ones."""
+
+    if not line_is_valid(grid[i, :]) or not line_is_valid(grid[:, j]):
+        return False
+    if grid_full(grid[i, :]) and "".join(grid[i, :]) in rows:
+        return False
+    if grid_full(grid[:, j]) and "".join(grid[:, j]) in cols:
+        return False
+    return True
 
-    if grid_full(grid):  # empty_list.shape[0] == 0:
-        if grid_is_valid(grid):
-            return True
-        else:
-            return False
 
-    i, j = empty_list[0]
+def solve_grid(grid: np.ndarray, empty_list: np.ndarray, order: str = "row") -> bool:
+    """Entry point to the recursive solver.
+
+    The cells are taken in the order of empty_list, or with order "mcv"
+    the most constrained cell first.
+    The grid itself must be valid, only the placements are checked."""
+
+    global nodes, backtracks, max_depth
+    nodes = backtracks = max_depth = 0
+    rows, cols = completed_lines(grid)
+    if order == "mcv":
+        options = {(i, j): cell_options(grid, i, j, rows, cols) for i, j in empty_list}
+        return solve_mcv(grid, options, rows, cols, 0)
+    return solve_from(grid, empty_list, 0, rows, cols)
+
+
+def solve_from(
+    grid: np.ndarray, empty_list: np.ndarray, k: int, rows: set[str], cols: set[str]
+) -> bool:
+    """Fill the cells of empty_list starting at index k."""
+
+    global nodes, backtracks, max_depth
+    nodes += 1
+    if k > max_depth:
+        max_depth = k
+    if k == len(empty_list):
+        return True
+
+    i, j = empty_list[k]
     for v in ["o", "x"]:
         # set tentative position
         grid[i, j] = v
-        if grid_is_valid(grid) and solve_grid(grid, empty_list[1:]):
-            return True
+        if placement_is_valid(grid, i, j, rows, cols):
+            row = "".join(grid[i, :]) if grid_full(grid[i, :]) else None
+            col = "".join(grid[:, j]) if grid_full(grid[:, j]) else None
+            if row:
+                rows.add(row)
+            if col:
+                cols.add(col)
+            if solve_from(grid, empty_list, k + 1, rows, cols):
+                return True
+            backtracks += 1
+            rows.discard(row)
+            cols.discard(col)
         # reset position
         grid[i, j] = ""
     return False
 
 
-def play_game(filename: str, prefill: bool) -> None:
-    """Initialize the game and play it."""
+def cell_options(
+    grid: np.ndarray, i: int, j: int, rows: set[str], cols: set[str]
+) -> list[str]:
+    """Return the values the empty cell (i, j) can take."""
 
-    grider = Grider(filename)
-    grid = grider.as_np()
+    options = []
+    for v in ["o", "x"]:
+        grid[i, j] = v
+        if placement_is_valid(grid, i, j, rows, cols):
+            options.append(v)
+    grid[i, j] = ""
+    return options
+
+
+def solve_mcv(
+    grid: np.ndarray,
+    options: dict[tuple[int, int], list[str]],
+    rows: set[str],
+    cols: set[str],
+    depth: int,
+) -> bool:
+    """Fill the empty cells, most constrained first.
+
+    options maps every empty cell to the values it can still take,
+    depth is the number of cells filled so far."""
+
+    global nodes, backtracks, max_depth
+    nodes += 1
+    if depth > max_depth:
+        max_depth = depth
+    if not options:
+        return True
+
+    # fewest options first, then the fewest empty cells in its row and column
+    empty_rows = np.count_nonzero(grid == "", axis=1)
+    empty_cols = np.count_nonzero(grid == "", axis=0)
+    i, j = min(
+        options,
+        key=lambda c: (len(options[c]), empty_rows[c[0]] + empty_cols[c[1]]),
+    )
+    values = options.pop((i, j))
+    crossing = [c for c in options if c[0] == i or c[1] == j]
 
-    if not grid_is_valid(grid):
+    for v in values:
+        # set tentative position, options of other lines may be stale
+        grid[i, j] = v
+        if not placement_is_valid(grid, i, j, rows, cols):
+            continue
+        row = "".join(grid[i, :]) if grid_full(grid[i, :]) else None
+        col = "".join(grid[:, j]) if grid_full(grid[:, j]) else None
+        if row:
+            rows.add(row)
+        if col:
+            cols.add(col)
+
+        # forward checking on the row and column of the cell
+        saved = {c: options[c] for c in crossing}
+        for c in crossing:
+            options[c] = cell_options(grid, *c, rows, cols)
+            if not options[c]:
+                break
+        else:
+            if solve_mcv(grid, options, rows, cols, depth + 1):
+                return True
+
+        backtracks += 1
+        options.update(saved)
+        rows.discard(row)
+        cols.discard(col)
+
+    # reset position
+    grid[i, j] = ""
+    options[(i, j)] = values
+    return False
+
+
+def search(
+    grid: np.ndarray, engine: str = "numpy", order: str = "row"
+) -> np.ndarray | None:
+    """Run the exhaustive search on a valid grid with the given engine.
+    Return the solved grid, or None if there is no solution."""
+
+    if engine == "bitboard":
+        bg = bitboard.BitGrid.from_np(grid)
+        if bitboard.solve_grid(bg, bitboard.empty_index(bg)):
+            return bg.to_np()
+    elif engine == "rows":
+        bg = bitboard.BitGrid.from_np(grid)
+        if rowsearch.solve_grid(bg):
+            return bg.to_np()
+    elif solve_grid(grid, empty_index(grid), order):
+        return grid
+    return None
+
+
+def count_solutions(grid: np.ndarray, cap: int = 0) -> int:
+    """Return the number of solutions of a valid grid, stopping at cap
+    unless it is 0. Counts with the row-wise search."""
+    return rowsearch.count_solutions(bitboard.BitGrid.from_np(grid), cap)
+
+
+def play_game(
+    filename: str,
+    prefill: bool,
+    engine: str = "numpy",
+    order: str = "row",
+    count: int | None = None,
+    show_stats: bool = False,
+) -> None:
+    """Initialize the game and play it, or count its solutions."""
+    import api
+
+    try:
+        grid = Grider(filename).grid
+    except (OSError, ValueError) as err:
+        print(err)
+        exit(1)
+
+    options = {
+        "prefill": prefill,
+        "engine": engine,
+        "order": order,
+        "count": count,
+        "stats": show_stats,
+    }
+    result = api.solve(grid, "native", options)
+
+    if result.status == "invalid":
         print("invalid grid")
         return
 
     print("initial grid")
-    grider.print_grid(grid)
+    Grider.print_grid(grid)
 
     if prefill:
-        print("starting prefilling")
-        heuristics(grid)
-        grider.print_np_grid(grid)
-
-    if grid_full(grid):
-        print("solution found with prefilling or already full")
-        grider.print_np_grid(grid)
+        print(f"prefilled {result.prefilled} cells")
+
+    if count is not None:
+        nb = result.solutions
+        print(
+            f"{result.status}: {nb}{'+' if count and nb == count else ''} "
+            f"solution(s) in {result.solve_time:.3f} s"
+        )
+    elif result.solution is not None:
+        Grider.print_grid(result.solution)
     else:
-        print("starting exhaustive search")
-        if grid_is_valid(grid) and solve_grid(grid, empty_index(grid)):
-            grider.print_grid(grid)
-        else:
-            print("cannot find a solution, sorry!")
+        print("cannot find a solution, sorry!")
+
+    if show_stats:
+        print(json.dumps(result.stats, indent=1))
 
 
 def main() -> None:
@@ -131,12 +322,41 @@ def main() -> None:
         "-p", "--prefill", action="store_true", help="use heuristics to prefill"
     )
 
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["numpy", "bitboard", "rows"],
+        default="numpy",
+        help="grid representation used by the exhaustive search",
+    )
+    parser.add_argument(
+        "-o",
+        "--order",
+        choices=["row", "mcv"],
+        default="row",
+        help="cell order of the numpy search: row-major or most constrained first",
+    )
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=int,
+        nargs="?",
+        const=2,
+        help="count the solutions, stopping at COUNT (default 2, 0 for all)",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print the search statistics as JSON"
+    )
+
     args = parser.parse_args()
 
     verbose_on = args.verbose
 
     print("binoxxo is the name of the game")
-    play_game(args.file, args.prefill)
+    if args.file:
+        play_game(
+            args.file, args.prefill, args.engine, args.order, args.count, args.stats
+        )
 
 
 if __name__ == "__main__":
@@ -7,26 +7,268 @@ Uses the OR-Tools CP-SAT solver.
 """
 
 import argparse
-from tools import Grider
+import json
+import time
+from tools import Grider, to_np, uniqueness
+from heuristics import heuristics
 from ortools.sat.python import cp_model
 
+MODELS = ["int", "bool"]
 
-class BinOXXO:
 
-    def __init__(self, filename: str):
-        self.grider = Grider(filename)
-        self.grid = self.grider.grid
-        print("initial grid")
-        self.grider.print_grid(self.grid)
+def int_model(model: cp_model.CpModel, n: int) -> list[list[cp_model.IntVar]]:
+    """Add the rules on 0-1 integer cells, return the cells."""
 
-    def solve(self) -> None:
+    # Variables for cells: 0 for 'o', 1 for 'x'.
+    x = [[model.NewIntVar(0, 1, f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+
+    # No three consecutive cells are identical (row and column).
+    for i in range(n):
+        for j in range(n - 2):
+            # in rows
+            model.Add(
+                x[i][j] + x[i][j + 1] + x[i][j + 2] >= 1
+            )  # At least one x in three
+            model.Add(
+                x[i][j] + x[i][j + 1] + x[i][j + 2] <= 2
+            )  # At most two x in three
+            # in columns
+            model.Add(x[j][i] + x[j + 1][i] + x[j + 2][i] >= 1)
+            model.Add(x[j][i] + x[j + 1][i] + x[j + 2][i] <= 2)
+
+    # Same number of o and x per row/column.
+    target_count = n // 2
+    for i in range(n):
+        model.Add(sum(x[i][j] for j in range(n)) == target_count)
+        model.Add(sum(x[j][i] for j in range(n)) == target_count)
+
+    # No two rows or columns can be identical.
+    # As a binary number a row or column can represent a number
+    # between 0 and 2**n - 1. These numbers should all be
+    # different per row or column.
+    def add_uniqueness_constraints(model, vectors):
+        fingerprints = []
+        for vec in vectors:
+            fp = model.NewIntVar(0, 2**n - 1, "")
+            model.Add(sum(vec[i] * (2**i) for i in range(n)) == fp)
+            fingerprints.append(fp)
+        model.AddAllDifferent(fingerprints)
+
+    add_uniqueness_constraints(model, x)  # rows
+    add_uniqueness_constraints(
+        model, [[x[r][c] for r in range(n)] for c in range(n)]
+    )  # columns
+
+    return x
+
+
+def bool_model(
+    model: cp_model.CpModel, grid: list[list[str]]
+) -> list[list[cp_model.IntVar]]:
+    """Add the rules as clauses on Boolean cells, return the cells.
+    The clues of the grid only spare the constraints they imply."""
+
+    n = len(grid)
+    # Variables for cells: false for 'o', true for 'x'.
+    x = [[model.NewBoolVar(f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+    cols = [[x[r][c] for r in range(n)] for c in range(n)]
+
+    for lines in (x, cols):
+        for line in lines:
+            # No three consecutive cells are identical.
+            for j in range(n - 2):
+                window = line[j : j + 3]
+                model.AddBoolOr(window)
+                model.AddBoolOr([v.Not() for v in window])
+
+            # Same number of o and x.
+            model.Add(sum(line) == n // 2)
+
+    # No two lines are identical. Lines are balanced, so two lines
+    # differ if and only if some cell holds an x in the first and an
+    # o in the second: d <=> u and not v. d is defined both ways, so
+    # every solution has a single assignment and counting stays exact.
+    clues = [grid, [list(col) for col in zip(*grid)]]
+    for lines, clue in zip((x, cols), clues):
+        for a in range(n):
+            for b in range(a + 1, n):
+                diff = []
+                for j in range(n):
+                    ca, cb = clue[a][j], clue[b][j]
+                    if ca in ("o", "x") and cb in ("o", "x") and ca != cb:
+                        # the clues already tell the lines apart
+                        break
+                    if ca == "o" or cb == "x":
+                        continue
+                    u, v = lines[a][j], lines[b][j]
+                    if ca == "x":
+                        diff.append(v.Not())
+                    elif cb == "o":
+                        diff.append(u)
+                    else:
+                        d = model.NewBoolVar("")
+                        model.AddBoolAnd([u, v.Not()]).OnlyEnforceIf(d)
+                        model.AddBoolOr([u.Not(), v, d])
+                        diff.append(d)
+                else:
+                    model.AddBoolOr(diff)
+
+    return x
+
+
+def make_solver(workers: int = 0, time_limit: float | None = None) -> cp_model.CpSolver:
+    """Return a solver set up with the number of workers and time limit."""
+    solver = cp_model.CpSolver()
+    if workers:
+        solver.parameters.num_workers = workers
+    if time_limit:
+        solver.parameters.max_time_in_seconds = time_limit
+    return solver
+
+
+def status_name(status: int) -> str:
+    # https://developers.google.com/optimization/cp/cp_solver#cp-sat_return_values
+
+    if status == cp_model.OPTIMAL:
+        msg = "OPT"
+    elif status == cp_model.FEASIBLE:
+        msg = "FEASIBLE"
+    elif status == cp_model.INFEASIBLE:
+        msg = "INFEASIBLE"
+    elif status == cp_model.MODEL_INVALID:
+        msg = "MODEL_INVALID"
+    else:
+        msg = "UNKNOWN"
+    return msg
+
+
+def read_solution(
+    solver: cp_model.CpSolver, x: list[list[cp_model.IntVar]]
+) -> list[list[str]]:
+    n = len(x)
+    sol = []
+    for r in range(n):
+        sol.append(["x" if solver.Value(x[r][c]) == 1 else "o" for c in range(n)])
+    return sol
+
+
+def solver_statistics(solver: cp_model.CpSolver) -> dict:
+    response = solver.ResponseProto()
+    return {name: getattr(response, name) for name in STATISTICS}
+
+
+STATISTICS = [
+    "num_booleans",
+    "num_conflicts",
+    "num_branches",
+    "num_binary_propagations",
+    "num_integer_propagations",
+    "num_restarts",
+    "num_lp_iterations",
+    "wall_time",
+    "user_time",
+    "deterministic_time",
+]
+
+
+class SolutionCounter(cp_model.CpSolverSolutionCallback):
+    """Count the solutions, stop the search at cap unless it is 0."""
+
+    def __init__(self, cap: int):
+        super().__init__()
+        self.cap = cap
+        self.count = 0
+
+    def on_solution_callback(self) -> None:
+        self.count += 1
+        if self.count == self.cap:
+            self.StopSearch()
+
+
+def counted(status: int, nb: int, cap: int) -> int | None:
+    """Return the number of solutions found, or None if the time limit
+    stopped the enumeration before all of them or the cap were found."""
+
+    if status in (cp_model.OPTIMAL, cp_model.INFEASIBLE) or (cap and nb >= cap):
+        return nb
+    return None
+
+
+class Search:
+    """Solving and counting a model, shared by BinOXXO and Template.
+    wall_time, nodes and last_solver describe the last call."""
+
+    workers: int
+    time_limit: float | None
+
+    def solve_model(
+        self, model: cp_model.CpModel, x: list[list[cp_model.IntVar]]
+    ) -> tuple[str, list[list[str]] | None]:
+        """Return the solver status and the solution grid, if any."""
+
+        solver = make_solver(self.workers, self.time_limit)
+        status = solver.Solve(model)
+
+        self.record(solver)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return status_name(status), None
+        return status_name(status), read_solution(solver, x)
+
+    def count_model(self, model: cp_model.CpModel, cap: int) -> int | None:
+        """Enumerate the solutions, stopping at cap unless it is 0.
+        Return the number of solutions found, None if the time limit
+        was hit first."""
+
+        solver = make_solver(self.workers, self.time_limit)
+        # parallel workers report some solutions more than once
+        solver.parameters.num_workers = 1
+        solver.parameters.enumerate_all_solutions = True
+        counter = SolutionCounter(cap)
+        status = solver.Solve(model, counter)
+
+        self.record(solver)
+        return counted(status, counter.count, cap)
+
+    def record(self, solver: cp_model.CpSolver) -> None:
+        self.wall_time = solver.WallTime()
+        self.nodes = solver.NumBranches()
+        self.last_solver = solver
+
+    def statistics(self) -> dict:
+        """Return the solver statistics of the last solve or count."""
+        return solver_statistics(self.last_solver)
+
+
+class BinOXXO(Search):
+
+    def __init__(
+        self,
+        grid: list[list[str]] | str,
+        model: str = "int",
+        workers: int = 0,
+        time_limit: float | None = None,
+        hint: bool = False,
+    ):
+        """grid is a grid as read by Grider, or the name of a file to read.
+        model is "int" or "bool", workers 0 lets CP-SAT decide, hint
+        passes the cells prefilled by the heuristics as solution hints."""
+        self.grid = Grider(grid).grid if isinstance(grid, str) else grid
+        self.model = model
+        self.workers = workers
+        self.time_limit = time_limit
+        self.hint = hint
+
+    def build(self) -> tuple[cp_model.CpModel, list[list[cp_model.IntVar]]]:
+        """Build the model, return it with the cell variables."""
         # Get the grid size from the input.
         n = len(self.grid)
+        start = time.perf_counter()
 
         model = cp_model.CpModel()
-
-        # Variables for cells: 0 for 'o', 1 for 'x'.
-        x = [[model.NewIntVar(0, 1, f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+        if self.model == "bool":
+            x = bool_model(model, self.grid)
+        else:
+            x = int_model(model, n)
 
         # Set constraints for preset cells.
         for r in range(n):
@@ -36,72 +278,94 @@ class BinOXXO:
                 elif self.grid[r][c] == "o":
                     model.Add(x[r][c] == 0)
 
-        # No three consecutive cells are identical (row and column).
-        for i in range(n):
-            for j in range(n - 2):
-                # in rows
-                model.Add(
-                    x[i][j] + x[i][j + 1] + x[i][j + 2] >= 1
-                )  # At least one x in three
-                model.Add(
-                    x[i][j] + x[i][j + 1] + x[i][j + 2] <= 2
-                )  # At most two x in three
-                # in columns
-                model.Add(x[j][i] + x[j + 1][i] + x[j + 2][i] >= 1)
-                model.Add(x[j][i] + x[j + 1][i] + x[j + 2][i] <= 2)
-
-        # Same number of o and x per row/column.
-        target_count = n // 2
-        for i in range(n):
-            model.Add(sum(x[i][j] for j in range(n)) == target_count)
-            model.Add(sum(x[j][i] for j in range(n)) == target_count)
-
-        # No two rows or columns can be identical.
-        # As a binary number a row or column can represent a number
-        # between 0 and 2**n - 1. These numbers should all be
-        # different per row or column.
-        def add_uniqueness_constraints(model, vectors):
-            fingerprints = []
-            for vec in vectors:
-                fp = model.NewIntVar(0, 2**n - 1, "")
-                model.Add(sum(vec[i] * (2**i) for i in range(n)) == fp)
-                fingerprints.append(fp)
-            model.AddAllDifferent(fingerprints)
-
-        add_uniqueness_constraints(model, x)  # rows
-        add_uniqueness_constraints(
-            model, [[x[r][c] for r in range(n)] for c in range(n)]
-        )  # columns
-
-        # Get solver and solve the model.
-        solver = cp_model.CpSolver()
-        status = solver.Solve(model)
+        # Hint the cells the heuristics can deduce.
+        if self.hint:
+            grid = to_np(self.grid)
+            heuristics(grid)
+            for r in range(n):
+                for c in range(n):
+                    if self.grid[r][c] not in ("x", "o") and grid[r, c] != "":
+                        model.AddHint(x[r][c], grid[r, c] == "x")
 
-        # https://developers.google.com/optimization/cp/cp_solver#cp-sat_return_values
+        self.build_time = time.perf_counter() - start
+        return model, x
 
-        if status == cp_model.OPTIMAL:
-            msg = "OPT"
-        elif status == cp_model.FEASIBLE:
-            msg = "FEASIBLE"
-        elif status == cp_model.INFEASIBLE:
-            msg = "INFEASIBLE"
-        elif status == cp_model.MODEL_INVALID:
-            msg = "MODEL_INVALID"
-        else:
-            msg = "UNKNOWN"
+    def solution(self) -> tuple[str, list[list[str]] | None]:
+        """Build and solve the model.
+        Return the solver status and the solution grid, if any."""
+        return self.solve_model(*self.build())
 
-        if status == cp_model.OPTIMAL or cp_model.FEASIBLE:
-            print(f"solved in {solver.WallTime():.3f} s with {msg}")
-            sol = []
-            for r in range(n):
-                sol.append(
-                    ["x" if solver.Value(x[r][c]) == 1 else "o" for c in range(n)]
-                )
-            self.grider.print_grid(sol)
+    def count(self, cap: int = 0) -> int | None:
+        """Enumerate the solutions, stopping at cap unless it is 0.
+        Return the number of solutions found, None if the time limit
+        was hit first."""
+        model, _ = self.build()
+        return self.count_model(model, cap)
+
+    def solve(self) -> None:
+        msg, sol = self.solution()
+        if sol is not None:
+            print(f"solved in {self.wall_time:.3f} s with {msg}")
+            Grider.print_grid(sol)
         else:
             print(f"problem: {msg}")
 
 
+class Template(Search):
+    """The rules for the grids of side n, built once and shared by all the
+    puzzles of that size. A puzzle is solved on a copy of the model where
+    the domains of the clue cells are fixed, which presolve can exploit
+    better than assumptions.
+
+    build_time is the time taken to build the rules once, setup_time the
+    copy of the last puzzle, wall_time its solve."""
+
+    def __init__(
+        self,
+        n: int,
+        model: str = "int",
+        workers: int = 0,
+        time_limit: float | None = None,
+    ):
+        start = time.perf_counter()
+        self.n = n
+        self.workers = workers
+        self.time_limit = time_limit
+        self.model = cp_model.CpModel()
+        if model == "bool":
+            self.x = bool_model(self.model, [[" "] * n for _ in range(n)])
+        else:
+            self.x = int_model(self.model, n)
+        self.build_time = time.perf_counter() - start
+
+    def overlay(self, grid: list[list[str]]) -> cp_model.CpModel:
+        """Return a copy of the model with the clues of grid fixed."""
+
+        if len(grid) != self.n:
+            raise ValueError(f"grid of side {len(grid)}, template of side {self.n}")
+        start = time.perf_counter()
+        model = self.model.Clone()
+        variables = model.Proto().variables
+        for r, row in enumerate(grid):
+            for c, v in enumerate(row):
+                if v in ("o", "x"):
+                    domain = variables[self.x[r][c].Index()].domain
+                    domain[0] = domain[1] = int(v == "x")
+        self.setup_time = time.perf_counter() - start
+        return model
+
+    def solution(self, grid: list[list[str]]) -> tuple[str, list[list[str]] | None]:
+        """Solve the puzzle grid, as read by Grider.
+        Return the solver status and the solution grid, if any."""
+        return self.solve_model(self.overlay(grid), self.x)
+
+    def count(self, grid: list[list[str]], cap: int = 0) -> int | None:
+        """Enumerate the solutions of the puzzle grid, stopping at cap
+        unless it is 0. Return the number of solutions found, None if the
+        time limit was hit first."""
+        return self.count_model(self.overlay(grid), cap)
+
+
 def main() -> None:
 
     parser = argparse.ArgumentParser()
@@ -110,14 +374,65 @@ def main() -> None:
         "-v", "--verbose", action="store_true", help="produce more verbose output"
     )
     parser.add_argument("-f", "--file", type=str, help="input file")
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=int,
+        nargs="?",
+        const=2,
+        help="count the solutions, stopping at COUNT (default 2, 0 for all)",
+    )
+    parser.add_argument(
+        "-m", "--model", choices=MODELS, default="int", help="cell variables"
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print the solver statistics as JSON"
+    )
+    parser.add_argument(
+        "-w", "--workers", type=int, default=0, help="search workers, 0 for auto"
+    )
+    parser.add_argument(
+        "-t", "--time-limit", type=float, help="time limit of the search in s"
+    )
+    parser.add_argument(
+        "--hint", action="store_true", help="hint the cells found by heuristics"
+    )
 
     args = parser.parse_args()
 
     print(f"BinOXXO using CP-SAT\n")
 
     if args.file:
-        binoxxo = BinOXXO(args.file)
-        binoxxo.solve()
+        try:
+            grid = Grider(args.file).grid
+        except (OSError, ValueError) as err:
+            print(err)
+            exit(1)
+        print("initial grid")
+        Grider.print_grid(grid)
+
+        binoxxo = BinOXXO(
+            grid,
+            model=args.model,
+            workers=args.workers,
+            time_limit=args.time_limit,
+            hint=args.hint,
+        )
+        if args.count is None:
+            binoxxo.solve()
+        else:
+            nb = binoxxo.count(args.count)
+            if nb is None:
+                print(f"unknown: time limit hit after {binoxxo.wall_time:.3f} s")
+            else:
+                # the cap reached, there may be more
+                more = "+" if args.count and nb == args.count else ""
+                print(
+                    f"{uniqueness(nb)}: {nb}{more} "
+                    f"solution(s) in {binoxxo.wall_time:.3f} s"
+                )
+        if args.stats:
+            print(json.dumps(binoxxo.statistics(), indent=1))
 
 
 if __name__ == "__main__":
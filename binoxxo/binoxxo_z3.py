@@ -7,97 +7,285 @@ Uses the Z3 Theorem Prover.
 """
 
 import argparse
-from tools import Grider
-from z3 import Int, Solver, sat, And, Sum, Distinct
+import json
+import time
+from tools import Grider, uniqueness
+from z3 import (
+    Bool,
+    Int,
+    Solver,
+    SolverFor,
+    sat,
+    And,
+    Not,
+    Or,
+    Xor,
+    Statistics,
+    PbEq,
+    Sum,
+    Distinct,
+    is_bool,
+    is_true,
+)
+
+MODELS = ["int", "bool"]
+
+
+def int_model(solver: Solver, n: int) -> list[list[Int]]:
+    """Add the rules on 0-1 integer cells, return the cells."""
+
+    # Int variables for grid cells: 0 for 'o', 1 for 'x'.
+    x = [[Int(f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+
+    # Bound constraints.
+    for r in range(n):
+        for c in range(n):
+            solver.add(And(x[r][c] >= 0, x[r][c] <= 1))
+
+    # No three consecutive cells are identical (row and column).
+    for i in range(n):
+        for j in range(n - 2):
+            # in rows
+            solver.add(
+                x[i][j] + x[i][j + 1] + x[i][j + 2] >= 1
+            )  # At least one x in three
+            solver.add(
+                x[i][j] + x[i][j + 1] + x[i][j + 2] <= 2
+            )  # At most two x in three
+            # in columns
+            solver.add(x[j][i] + x[j + 1][i] + x[j + 2][i] >= 1)
+            solver.add(x[j][i] + x[j + 1][i] + x[j + 2][i] <= 2)
+
+    # Same number of o and x per row/column.
+    target_count = n // 2
+    for i in range(n):
+        solver.add(sum(x[i][j] for j in range(n)) == target_count)
+        solver.add(sum(x[j][i] for j in range(n)) == target_count)
+
+    # No two rows or columns can be identical.
+    # As a binary number a row or column can represent a number
+    # between 0 and 2**n - 1. These numbers should all be
+    # different per row or column.
+    def add_uniqueness_constraints(solver, vectors, prefix):
+        fingerprints = []
+        for r, vec in enumerate(vectors):
+            # 1. Create a Z3 integer variable.
+            # Z3 Ints are mathematical (unbounded), so we add range constraints.
+            fp = Int(f"fp_{prefix}_{r}")
+            solver.add(fp >= 0, fp < 2**n)
+
+            # 2. Map the vector to a single integer value (fingerprint)
+            # Sum() in Z3 takes a list of expressions
+            solver.add(Sum([vec[i] * (2**i) for i in range(n)]) == fp)
+            fingerprints.append(fp)
+
+        # 3. Ensure all fingerprints are unique
+        solver.add(Distinct(fingerprints))
+
+    add_uniqueness_constraints(solver, x, "r")  # rows
+    add_uniqueness_constraints(
+        solver, [[x[r][c] for r in range(n)] for c in range(n)], "c"
+    )  # columns
+
+    return x
+
+
+def bool_model(solver: Solver, n: int) -> list[list[Bool]]:
+    """Add the rules on Boolean cells, return the cells."""
+
+    # Bool variables for grid cells: false for 'o', true for 'x'.
+    x = [[Bool(f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+    cols = [[x[r][c] for r in range(n)] for c in range(n)]
+
+    for lines in (x, cols):
+        for line in lines:
+            # No three consecutive cells are identical, as two clauses:
+            # the SAT core handles them directly, unlike AtMost/AtLeast.
+            for j in range(n - 2):
+                window = line[j : j + 3]
+                solver.add(Or(window), Or([Not(v) for v in window]))
+
+            # Same number of o and x.
+            solver.add(PbEq([(v, 1) for v in line], n // 2))
+
+        # No two lines are identical: they differ in some cell.
+        for a in range(n):
+            for b in range(a + 1, n):
+                solver.add(Or([Xor(u, v) for u, v in zip(lines[a], lines[b])]))
+
+    return x
+
+
+def add_clues(solver: Solver, x: list[list[Int]], grid: list[list[str]]) -> None:
+    """Fix the cells given by the grid."""
+    n = len(grid)
+    for r in range(n):
+        for c in range(n):
+            if grid[r][c] == "x":
+                solver.add(x[r][c] if is_bool(x[r][c]) else x[r][c] == 1)
+            elif grid[r][c] == "o":
+                solver.add(Not(x[r][c]) if is_bool(x[r][c]) else x[r][c] == 0)
+
+
+def count_models(solver: Solver, x: list[list[Int]], cap: int) -> int:
+    """Count the models of the solver, blocking each one before the next
+    check, stopping at cap unless it is 0."""
+    n = len(x)
+    nb = 0
+    while (not cap or nb < cap) and solver.check() == sat:
+        nb += 1
+        model = solver.model()
+        solver.add(
+            Or([x[r][c] != model.eval(x[r][c]) for r in range(n) for c in range(n)])
+        )
+    return nb
+
+
+def read_solution(model, x: list[list[Int]]) -> list[list[str]]:
+    n = len(x)
+    sol = []
+    for r in range(n):
+        sol.append(["x" if is_x(model.eval(x[r][c])) else "o" for c in range(n)])
+    return sol
+
+
+def is_x(value) -> bool:
+    return is_true(value) if is_bool(value) else value.as_long() == 1
+
+
+def decisions(stats: Statistics) -> int:
+    for key in ("decisions", "sat decisions"):
+        if key in stats.keys():
+            return stats.get_key_value(key)
+    return 0
+
+
+def statistics_dict(stats: Statistics) -> dict:
+    return {key: stats.get_key_value(key) for key in stats.keys()}
 
 
 class BinOXXO:
 
-    def __init__(self, filename: str):
-        self.grider = Grider(filename)
-        self.grid = self.grider.grid
-        print("initial grid")
-        self.grider.print_grid(self.grid)
+    def __init__(self, grid: list[list[str]] | str, model: str = "int"):
+        """grid is a grid as read by Grider, or the name of a file to read.
+        model is "int" or "bool"."""
+        self.grid = Grider(grid).grid if isinstance(grid, str) else grid
+        self.model = model
 
-    def solve(self) -> None:
+    def build(self) -> tuple[Solver, list[list[Int]]]:
+        """Build the model, return the solver with the cell variables."""
         # Get the grid size from the input.
         n = len(self.grid)
+        start = time.perf_counter()
 
         solver = Solver()
+        x = bool_model(solver, n) if self.model == "bool" else int_model(solver, n)
+        add_clues(solver, x, self.grid)
 
-        # Int variables for grid cells: 0 for 'o', 1 for 'x'.
-        x = [[Int(f"x_{r}_{c}") for c in range(n)] for r in range(n)]
+        self.build_time = time.perf_counter() - start
+        return solver, x
 
-        # Bound constraints.
-        for r in range(n):
-            for c in range(n):
-                solver.add(And(x[r][c] >= 0, x[r][c] <= 1))
+    def solution(self) -> tuple[str, list[list[str]] | None]:
+        """Build and solve the model.
+        Return the solver status and the solution grid, if any."""
+        solver, x = self.build()
 
-        # Set constraints for preset cells.
-        for r in range(n):
-            for c in range(n):
-                if self.grid[r][c] == "x":
-                    solver.add(x[r][c] == 1)
-                elif self.grid[r][c] == "o":
-                    solver.add(x[r][c] == 0)
+        # Get solver and solve the model.
+        status = solver.check()
+        self.last_stats = solver.statistics()
+        self.wall_time = self.last_stats.time
+        self.nodes = decisions(self.last_stats)
+        if status != sat:
+            return str(status), None
+        return str(status), read_solution(solver.model(), x)
 
-        # No three consecutive cells are identical (row and column).
-        for i in range(n):
-            for j in range(n - 2):
-                # in rows
-                solver.add(
-                    x[i][j] + x[i][j + 1] + x[i][j + 2] >= 1
-                )  # At least one x in three
-                solver.add(
-                    x[i][j] + x[i][j + 1] + x[i][j + 2] <= 2
-                )  # At most two x in three
-                # in columns
-                solver.add(x[j][i] + x[j + 1][i] + x[j + 2][i] >= 1)
-                solver.add(x[j][i] + x[j + 1][i] + x[j + 2][i] <= 2)
-
-        # Same number of o and x per row/column.
-        target_count = n // 2
-        for i in range(n):
-            solver.add(sum(x[i][j] for j in range(n)) == target_count)
-            solver.add(sum(x[j][i] for j in range(n)) == target_count)
-
-        # No two rows or columns can be identical.
-        # As a binary number a row or column can represent a number
-        # between 0 and 2**n - 1. These numbers should all be
-        # different per row or column.
-        def add_uniqueness_constraints(solver, vectors, prefix):
-            fingerprints = []
-            for r, vec in enumerate(vectors):
-                # 1. Create a Z3 integer variable.
-                # Z3 Ints are mathematical (unbounded), so we add range constraints.
-                fp = Int(f"fp_{prefix}_{r}")
-                solver.add(fp >= 0, fp < 2**n)
-
-                # 2. Map the vector to a single integer value (fingerprint)
-                # Sum() in Z3 takes a list of expressions
-                solver.add(Sum([vec[i] * (2**i) for i in range(n)]) == fp)
-                fingerprints.append(fp)
-
-            # 3. Ensure all fingerprints are unique
-            solver.add(Distinct(fingerprints))
-
-        add_uniqueness_constraints(solver, x, "r")  # rows
-        add_uniqueness_constraints(
-            solver, [[x[r][c] for r in range(n)] for c in range(n)], "c"
-        )  # columns
+    def count(self, cap: int = 0) -> int:
+        """Enumerate the solutions, stopping at cap unless it is 0.
+        Every model found is blocked before the next check.
+        Return the number of solutions found."""
+        solver, x = self.build()
 
-        # Get solver and solve the model.
-        if solver.check() == sat:
-            model = solver.model()
-            stats = solver.statistics()
-
-            print(f"solved in {stats.time:.3f} s with")
-            sol = []
-            for r in range(n):
-                sol.append(["x" if model.eval(x[r][c]) == 1 else "o" for c in range(n)])
-            self.grider.print_grid(sol)
+        start = time.perf_counter()
+        nb = count_models(solver, x, cap)
+        self.wall_time = time.perf_counter() - start
+        self.last_stats = solver.statistics()
+        return nb
+
+    def statistics(self) -> dict:
+        """Return the solver statistics of the last solve or count."""
+        return statistics_dict(self.last_stats)
+
+    def solve(self) -> None:
+        msg, sol = self.solution()
+        if sol is not None:
+            print(f"solved in {self.wall_time:.3f} s with {msg}")
+            Grider.print_grid(sol)
+        else:
+            print(f"problem: {msg}")
+
+
+class Session:
+    """A solver holding the rules for the grids of side n, kept for all the
+    puzzles of that size. The clues of a puzzle are added in a push/pop
+    scope, the lemmas learned on the rules carry over to the next puzzle.
+
+    The default solver falls back to its slow incremental core once push()
+    is used, the finite-domain solver keeps bit-blasting the bounded
+    integers to SAT and stays incremental.
+
+    build_time is the time taken to add the rules once, setup_time the
+    clues of the last puzzle, wall_time its check."""
+
+    def __init__(self, n: int, model: str = "int"):
+        start = time.perf_counter()
+        self.n = n
+        self.solver = SolverFor("QF_FD")
+        if model == "bool":
+            self.x = bool_model(self.solver, n)
         else:
-            print(f"problem!")
+            self.x = int_model(self.solver, n)
+        self.build_time = time.perf_counter() - start
+
+    def push(self, grid: list[list[str]]) -> None:
+        if len(grid) != self.n:
+            raise ValueError(f"grid of side {len(grid)}, session of side {self.n}")
+        start = time.perf_counter()
+        self.solver.push()
+        add_clues(self.solver, self.x, grid)
+        self.setup_time = time.perf_counter() - start
+
+    def solution(self, grid: list[list[str]]) -> tuple[str, list[list[str]] | None]:
+        """Solve the puzzle grid, as read by Grider.
+        Return the solver status and the solution grid, if any."""
+        self.push(grid)
+        try:
+            start = time.perf_counter()
+            status = self.solver.check()
+            self.wall_time = time.perf_counter() - start
+            self.last_stats = self.solver.statistics()
+            self.nodes = decisions(self.last_stats)
+            if status != sat:
+                return str(status), None
+            return str(status), read_solution(self.solver.model(), self.x)
+        finally:
+            self.solver.pop()
+
+    def statistics(self) -> dict:
+        """Return the solver statistics of the last solve or count."""
+        return statistics_dict(self.last_stats)
+
+    def count(self, grid: list[list[str]], cap: int = 0) -> int:
+        """Enumerate the solutions of the puzzle grid, stopping at cap
+        unless it is 0. Return the number of solutions found."""
+        self.push(grid)
+        try:
+            start = time.perf_counter()
+            nb = count_models(self.solver, self.x, cap)
+            self.wall_time = time.perf_counter() - start
+            self.last_stats = self.solver.statistics()
+            return nb
+        finally:
+            self.solver.pop()
 
 
 def main() -> None:
@@ -108,14 +296,48 @@ def main() -> None:
         "-v", "--verbose", action="store_true", help="produce more verbose output"
     )
     parser.add_argument("-f", "--file", type=str, help="input file")
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=int,
+        nargs="?",
+        const=2,
+        help="count the solutions, stopping at COUNT (default 2, 0 for all)",
+    )
+
+    parser.add_argument(
+        "-m", "--model", choices=MODELS, default="int", help="cell variables"
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print the solver statistics as JSON"
+    )
 
     args = parser.parse_args()
 
     print(f"BinOXXO using Z3\n")
 
     if args.file:
-        binoxxo = BinOXXO(args.file)
-        binoxxo.solve()
+        try:
+            grid = Grider(args.file).grid
+        except (OSError, ValueError) as err:
+            print(err)
+            exit(1)
+        print("initial grid")
+        Grider.print_grid(grid)
+
+        binoxxo = BinOXXO(grid, model=args.model)
+        if args.count is None:
+            binoxxo.solve()
+        else:
+            nb = binoxxo.count(args.count)
+            # the cap reached, there may be more
+            more = "+" if args.count and nb == args.count else ""
+            print(
+                f"{uniqueness(nb)}: {nb}{more} "
+                f"solution(s) in {binoxxo.wall_time:.3f} s"
+            )
+        if args.stats:
+            print(json.dumps(binoxxo.statistics(), indent=1))
 
 
 if __name__ == "__main__":
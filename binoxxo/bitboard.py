@@ -0,0 +1,201 @@
+"""
+BinOXXO Program Solver
+
+Bitboard engine for the brute-force approach.
+
+Every row and every column is kept as a pair of integers: a mask of the
+filled cells and a mask of the cells holding an x. Bit j of row i and
+bit i of column j both describe the cell (i, j).
+"""
+
+import numpy as np
+
+# search statistics of the last search: nodes visited, assignments undone
+# and deepest level reached
+nodes = backtracks = max_depth = 0
+
+
+class BitGrid:
+
+    def __init__(self, n: int):
+        self.n = n
+        self.full = (1 << n) - 1
+        self.row_filled = [0] * n
+        self.row_x = [0] * n
+        self.col_filled = [0] * n
+        self.col_x = [0] * n
+
+    @classmethod
+    def from_np(cls, grid: np.ndarray) -> "BitGrid":
+        """Build a bitboard from a grid as returned by Grider.as_np()."""
+        bg = cls(grid.shape[0])
+        # Python ints, numpy indices would turn the masks into 64-bit ints
+        for i, j in np.argwhere(grid != "").tolist():
+            bg.set(i, j, grid[i, j])
+        return bg
+
+    def to_np(self) -> np.ndarray:
+        """Return the grid in the format of Grider.as_np()."""
+        grid = np.full((self.n, self.n), "", dtype="<U1")
+        for i in range(self.n):
+            for j in range(self.n):
+                if self.row_filled[i] >> j & 1:
+                    grid[i, j] = "x" if self.row_x[i] >> j & 1 else "o"
+        return grid
+
+    def copy(self) -> "BitGrid":
+        bg = BitGrid(self.n)
+        bg.row_filled = self.row_filled[:]
+        bg.row_x = self.row_x[:]
+        bg.col_filled = self.col_filled[:]
+        bg.col_x = self.col_x[:]
+        return bg
+
+    def set(self, i: int, j: int, v: str) -> None:
+        """Place v ("o" or "x") on the empty cell (i, j)."""
+        self.row_filled[i] |= 1 << j
+        self.col_filled[j] |= 1 << i
+        if v == "x":
+            self.row_x[i] |= 1 << j
+            self.col_x[j] |= 1 << i
+
+    def set_row(self, i: int, xs: int) -> None:
+        """Fill the whole row i, x where the bit of xs is set and o elsewhere."""
+        for j in range(self.n):
+            self.clear(i, j)
+            self.set(i, j, "x" if xs >> j & 1 else "o")
+
+    def clear(self, i: int, j: int) -> None:
+        """Empty the cell (i, j)."""
+        self.row_filled[i] &= ~(1 << j)
+        self.col_filled[j] &= ~(1 << i)
+        self.row_x[i] &= ~(1 << j)
+        self.col_x[j] &= ~(1 << i)
+
+
+def line_is_valid(filled: int, xs: int, half: int) -> bool:
+    """Check the balance and triple rules on a single line."""
+    os = filled & ~xs
+    if xs.bit_count() > half or os.bit_count() > half:
+        return False
+    if xs & (xs >> 1) & (xs >> 2) or os & (os >> 1) & (os >> 2):
+        return False
+    return True
+
+
+def lines_are_distinct(filled: list[int], xs: list[int], full: int) -> bool:
+    """Check that no two full lines are identical."""
+    seen = set()
+    for f, x in zip(filled, xs):
+        if f == full:
+            if x in seen:
+                return False
+            seen.add(x)
+    return True
+
+
+def grid_is_valid(grid: BitGrid) -> bool:
+    """Check for valid grid."""
+
+    half = grid.n // 2
+    for f, x in zip(grid.row_filled, grid.row_x):
+        if not line_is_valid(f, x, half):
+            return False
+    for f, x in zip(grid.col_filled, grid.col_x):
+        if not line_is_valid(f, x, half):
+            return False
+
+    # cannot have two identical rows/columns, but only when they are full!
+    return lines_are_distinct(
+        grid.row_filled, grid.row_x, grid.full
+    ) and lines_are_distinct(grid.col_filled, grid.col_x, grid.full)
+
+
+def grid_full(grid: BitGrid) -> bool:
+    """Return True if the (partial) grid is full."""
+    return all(f == grid.full for f in grid.row_filled)
+
+
+def empty_index(grid: BitGrid) -> list[tuple[int, int]]:
+    """Return the empty cells in row-major order."""
+    return [
+        (i, j)
+        for i in range(grid.n)
+        for j in range(grid.n)
+        if not grid.row_filled[i] >> j & 1
+    ]
+
+
+def completed_lines(grid: BitGrid) -> tuple[set[int], set[int]]:
+    """Return the x masks of the full rows and of the full columns."""
+    rows = {x for f, x in zip(grid.row_filled, grid.row_x) if f == grid.full}
+    cols = {x for f, x in zip(grid.col_filled, grid.col_x) if f == grid.full}
+    return rows, cols
+
+
+def placement_is_valid(
+    grid: BitGrid, i: int, j: int, rows: set[int], cols: set[int]
+) -> bool:
+    """Check the row and column of the cell (i, j) just set, and its full
+    lines against the completed ones."""
+
+    half = grid.n // 2
+    if not line_is_valid(grid.row_filled[i], grid.row_x[i], half):
+        return False
+    if not line_is_valid(grid.col_filled[j], grid.col_x[j], half):
+        return False
+    if grid.row_filled[i] == grid.full and grid.row_x[i] in rows:
+        return False
+    if grid.col_filled[j] == grid.full and grid.col_x[j] in cols:
+        return False
+    return True
+
+
+def solve_grid(grid: BitGrid, empty_list: list[tuple[int, int]]) -> bool:
+    """Entry point to the recursive solver.
+
+    The grid itself must be valid, only the placements are checked."""
+
+    global nodes, backtracks, max_depth
+    nodes = backtracks = max_depth = 0
+    rows, cols = completed_lines(grid)
+    return solve_from(grid, empty_list, 0, rows, cols)
+
+
+def solve_from(
+    grid: BitGrid,
+    empty_list: list[tuple[int, int]],
+    k: int,
+    rows: set[int],
+    cols: set[int],
+) -> bool:
+    """Fill the cells of empty_list starting at index k."""
+
+    global nodes, backtracks, max_depth
+    nodes += 1
+    if k > max_depth:
+        max_depth = k
+    if k == len(empty_list):
+        return True
+
+    i, j = empty_list[k]
+    for v in ["o", "x"]:
+        # set tentative position
+        grid.set(i, j, v)
+        if placement_is_valid(grid, i, j, rows, cols):
+            row_done = grid.row_filled[i] == grid.full
+            col_done = grid.col_filled[j] == grid.full
+            if row_done:
+                rows.add(grid.row_x[i])
+            if col_done:
+                cols.add(grid.col_x[j])
+            if solve_from(grid, empty_list, k + 1, rows, cols):
+                return True
+            backtracks += 1
+            if row_done:
+                rows.discard(grid.row_x[i])
+            if col_done:
+                cols.discard(grid.col_x[j])
+        # reset position
+        grid.clear(i, j)
+    return False
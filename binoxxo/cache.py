@@ -0,0 +1,140 @@
+"""
+BinOXXO Program Solver
+
+Cache of solutions keyed on the canonical form of the clues.
+
+The rules do not change when the grid is rotated, mirrored or when o and
+x are swapped, so the 16 grids obtained that way share their solution up
+to the same transformation. The key of a grid is the smallest of the 16
+as bytes, coded with EMPTY, O and X; the solution is stored in the frame
+of that canonical grid and mapped back to the frame of each query.
+
+Recent entries are kept in memory, up to maxsize. With a path, every
+entry is also written to a dbm file, looked up on a memory miss, so the
+cache survives restarts.
+"""
+
+import dbm
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+
+from tools import CODES, decode
+
+# swap o and x
+SWAP = np.array([0, 2, 1], dtype=np.uint8)
+
+# transformations t: t % 8 indexes the rotations and mirrors of symmetries(),
+# t >= 8 also swaps o and x
+TRANSFORMS = range(16)
+
+# stored for grids without a solution
+UNSOLVABLE = b""
+
+
+@lru_cache
+def symmetries(n: int) -> np.ndarray:
+    """Return the cell order of the 4 rotations of a grid of side n and
+    of their mirrors, one row each, as indices into the flat grid."""
+
+    cells = np.arange(n * n).reshape(n, n)
+    turns = [np.rot90(cells, k) for k in range(4)]
+    return np.stack(turns + [t[:, ::-1] for t in turns]).reshape(8, -1)
+
+
+def transform(grid: np.ndarray, t: int) -> np.ndarray:
+    n = len(grid)
+    flat = grid.ravel()[symmetries(n)[t % 8]]
+    return (SWAP[flat] if t >= 8 else flat).reshape(n, n)
+
+
+def inverse(grid: np.ndarray, t: int) -> np.ndarray:
+    n = len(grid)
+    flat = np.empty(n * n, dtype=grid.dtype)
+    flat[symmetries(n)[t % 8]] = grid.ravel()
+    return (SWAP[flat] if t >= 8 else flat).reshape(n, n)
+
+
+def canonical(grid: np.ndarray) -> tuple[bytes, int]:
+    """Return the key of a uint8 grid and the transformation to its
+    canonical form."""
+
+    n = len(grid)
+    flat = grid.ravel()[symmetries(n)]
+    data = np.concatenate([flat, SWAP[flat]]).tobytes()
+    key, t = min((data[t * n * n : (t + 1) * n * n], t) for t in TRANSFORMS)
+    return bytes([n]) + key, t
+
+
+def codes(grid: list[list[str]]) -> np.ndarray:
+    """Return a grid as read by Grider as a uint8 grid."""
+    text = "".join("".join(row) for row in grid).encode()
+    return CODES[np.frombuffer(text, dtype=np.uint8)].reshape(len(grid), -1)
+
+
+class SolutionCache:
+
+    def __init__(self, maxsize: int = 4096, path: str | None = None):
+        """Keep up to maxsize solutions in memory, and all of them in the
+        dbm file path if given."""
+
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.db = dbm.open(path, "c") if path else None
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def lookup(self, key: bytes) -> bytes | None:
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            if self.db is not None and key in self.db:
+                value = self.db[key]
+                self.store(key, value)
+                return value
+        return None
+
+    def store(self, key: bytes, value: bytes) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def get(self, grid: list[list[str]]) -> tuple[bool, list[list[str]] | None]:
+        """Return (True, solution) if the grid or one of its transforms is
+        known, solution being None if it has none, else (False, None)."""
+
+        g = codes(grid)
+        key, t = canonical(g)
+        value = self.lookup(key)
+        if value is None:
+            self.misses += 1
+            return False, None
+        self.hits += 1
+        if value == UNSOLVABLE:
+            return True, None
+        sol = np.frombuffer(value, dtype=np.uint8).reshape(g.shape)
+        return True, decode(inverse(sol, t)).tolist()
+
+    def put(self, grid: list[list[str]], solution: list[list[str]] | None) -> None:
+        """Remember the solution of a grid, None if it has none."""
+
+        key, t = canonical(codes(grid))
+        value = UNSOLVABLE
+        if solution is not None:
+            value = transform(codes(solution), t).tobytes()
+        with self.lock:
+            self.store(key, value)
+            if self.db is not None:
+                self.db[key] = value
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,131 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Client of daemon.py: sends puzzle files over its Unix socket.
+
+Only the standard library is imported, the daemon parses the puzzles, so
+a call costs the Python start and the solve.
+"""
+
+import argparse
+import json
+import socket
+import sys
+
+# as in daemon.py, which imports the backends
+SOCKET = "/tmp/binoxxo.sock"
+
+
+class Client:
+
+    def __init__(self, path: str = SOCKET):
+        """Connect to the daemon listening on path. Raise OSError if none
+        does."""
+
+        self.sock = socket.socket(socket.AF_UNIX)
+        self.sock.connect(path)
+        self.reader = self.sock.makefile("rb")
+
+    def request(self, request: dict) -> dict:
+        self.sock.sendall((json.dumps(request) + "\n").encode())
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("the daemon closed the connection")
+        return json.loads(line)
+
+    def solve(self, text: str, backend: str = "native", options: dict | None = None):
+        """Solve a puzzle given in the format of the puzzle files, return
+        the fields of api.Result as a dict."""
+
+        return self.request(
+            {"grid": text, "backend": backend, "options": options or {}}
+        )
+
+    def close(self) -> None:
+        self.reader.close()
+        self.sock.close()
+
+
+def print_grid(grid: list[list[str]]) -> None:
+    """Print a grid as Grider.print_grid(), tools imports NumPy."""
+
+    print("")
+    for row in grid:
+        print("".join(f" {c} " if c in ("o", "x") else " . " for c in row))
+    print("")
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="*", help="puzzle files")
+    parser.add_argument("-s", "--socket", default=SOCKET, help="socket path")
+    parser.add_argument(
+        "-b", "--backend", choices=["native", "cp-sat", "z3"], default="native"
+    )
+    parser.add_argument(
+        "-p", "--prefill", action="store_true", help="use heuristics to prefill"
+    )
+    parser.add_argument("-m", "--model", choices=["int", "bool"], help="cell variables")
+    parser.add_argument(
+        "-c",
+        "--count",
+        type=int,
+        nargs="?",
+        const=2,
+        help="count the solutions, stopping at COUNT (default 2, 0 for all)",
+    )
+    parser.add_argument(
+        "-j", "--json", action="store_true", help="print the replies as JSON lines"
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print the counters of the daemon"
+    )
+    parser.add_argument("--stop", action="store_true", help="stop the daemon")
+
+    args = parser.parse_args()
+
+    options = {"prefill": args.prefill, "count": args.count}
+    if args.model:
+        options["model"] = args.model
+
+    try:
+        client = Client(args.socket)
+    except OSError as err:
+        print(f"no daemon on {args.socket}: {err}", file=sys.stderr)
+        exit(1)
+
+    for filename in args.files:
+        try:
+            with open(filename) as f:
+                reply = client.solve(f.read(), args.backend, options)
+        except OSError as err:
+            reply = {"status": "error", "error": str(err)}
+        if args.json:
+            print(json.dumps({"file": filename, **reply}))
+            continue
+
+        print(f"{filename}: {reply['status']}", end="")
+        if reply.get("error"):
+            print(f" {reply['error']}")
+        elif reply.get("solutions") is not None:
+            print(f" {reply['solutions']} solution(s)")
+        else:
+            print(f" in {reply.get('solve_time', 0):.3f} s")
+        if reply.get("solution"):
+            print_grid(reply["solution"])
+
+    if args.stats:
+        print(json.dumps(client.request({"command": "stats"}), indent=1))
+    if args.stop:
+        client.request({"command": "shutdown"})
+    client.close()
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,216 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Binary corpus of puzzles, read through a memory map.
+
+A .boxx file starts with a 16 bytes header: the magic BOXX, the format
+version, the side n, the flags and the number K of puzzles. Then come,
+one after the other:
+
+- the puzzles, 2 bits per cell coded with EMPTY, O and X from tools,
+  four cells per byte, first cell in the high bits: n * n / 4 bytes each;
+- with SOLUTIONS, the solutions, 1 bit per cell set for x, each padded
+  to whole bytes;
+- with META, one METADATA record per puzzle.
+
+Corpus maps the file read-only, so opening it reads only the header and
+processes opening the same file share its pages.
+"""
+
+import argparse
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from tools import EMPTY, O, X, Grider, decode, encode
+
+MAGIC = b"BOXX"
+VERSION = 1
+SUFFIX = ".boxx"
+
+# flags
+SOLUTIONS = 1
+META = 2
+
+HEADER = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "u1"),
+        ("n", "u1"),
+        ("flags", "u1"),
+        ("pad", "u1"),
+        ("count", "<u8"),
+    ]
+)
+
+# per puzzle: number of clues, search nodes of the native solver as a
+# measure of difficulty and solve time in s
+METADATA = np.dtype([("clues", "<u2"), ("nodes", "<u4"), ("solve_time", "<f4")])
+
+
+def pack(grids: np.ndarray) -> np.ndarray:
+    """Pack uint8 grids of shape (K, n, n) into 2 bits per cell."""
+
+    cells = grids.reshape(len(grids), -1, 4)
+    return cells[..., 0] << 6 | cells[..., 1] << 4 | cells[..., 2] << 2 | cells[..., 3]
+
+
+def unpack(packed: np.ndarray, n: int) -> np.ndarray:
+    """Turn packed puzzles of shape (K, n * n / 4) back into (K, n, n)."""
+
+    cells = packed[..., None] >> np.array([6, 4, 2, 0], dtype=np.uint8) & 3
+    return cells.reshape(-1, n, n)
+
+
+def pack_solutions(solutions: np.ndarray) -> np.ndarray:
+    """Pack full uint8 grids of shape (K, n, n) into 1 bit per cell."""
+    return np.packbits(solutions.reshape(len(solutions), -1) == X, axis=1)
+
+
+def unpack_solutions(packed: np.ndarray, n: int) -> np.ndarray:
+    """Turn packed solutions back into uint8 grids of shape (K, n, n)."""
+
+    bits = np.unpackbits(packed, axis=-1, count=n * n)
+    return np.where(bits, X, O).astype(np.uint8).reshape(-1, n, n)
+
+
+def write_corpus(
+    filename: str,
+    grids: np.ndarray,
+    solutions: np.ndarray | None = None,
+    meta: np.ndarray | None = None,
+) -> None:
+    """Write uint8 grids of shape (K, n, n), with their solutions and METADATA
+    records if given, into a corpus file."""
+
+    count, n = len(grids), grids.shape[-1]
+    if n % 2:
+        raise ValueError(f"the side {n} is not even")
+    header = np.zeros(1, dtype=HEADER)
+    header["magic"] = MAGIC
+    header["version"] = VERSION
+    header["n"] = n
+    header["flags"] = (solutions is not None) * SOLUTIONS + (meta is not None) * META
+    header["count"] = count
+    with open(filename, "wb") as f:
+        f.write(header.tobytes())
+        f.write(pack(grids.astype(np.uint8)).tobytes())
+        if solutions is not None:
+            f.write(pack_solutions(solutions).tobytes())
+        if meta is not None:
+            f.write(meta.astype(METADATA).tobytes())
+
+
+class Corpus:
+
+    def __init__(self, filename: str):
+        """Map a corpus file. Raise OSError if it cannot be read or
+        ValueError if it is not a corpus."""
+
+        self.data = np.memmap(filename, dtype=np.uint8, mode="r")
+        if len(self.data) < HEADER.itemsize:
+            raise ValueError(f"{filename} is not a corpus")
+        header = self.data[: HEADER.itemsize].view(HEADER)[0]
+        if header["magic"] != MAGIC or header["version"] != VERSION:
+            raise ValueError(f"{filename} is not a corpus")
+        self.n, self.count = int(header["n"]), int(header["count"])
+        self.flags = int(header["flags"])
+
+        offset = HEADER.itemsize
+        self.puzzles, offset = self.section(offset, self.n * self.n // 4)
+        self.solutions = self.meta = None
+        if self.flags & SOLUTIONS:
+            self.solutions, offset = self.section(offset, (self.n * self.n + 7) // 8)
+        if self.flags & META:
+            meta, offset = self.section(offset, METADATA.itemsize)
+            self.meta = meta.view(METADATA)[:, 0]
+        if offset != len(self.data):
+            raise ValueError(f"{filename} has {len(self.data)} bytes, not {offset}")
+
+    def section(self, offset: int, size: int) -> tuple[np.ndarray, int]:
+        """Return the view of count records of size bytes from offset."""
+
+        end = offset + self.count * size
+        if end > len(self.data):
+            raise ValueError("truncated corpus")
+        return self.data[offset:end].reshape(self.count, size), end
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, index: int | slice) -> np.ndarray:
+        """Return puzzle index as a uint8 grid, or a slice as (k, n, n)."""
+
+        grids = unpack(self.puzzles[index], self.n)
+        return grids[0] if isinstance(index, (int, np.integer)) else grids
+
+    def solution(self, index: int | slice) -> np.ndarray | None:
+        """Return the solution of puzzle index like __getitem__, None if
+        the corpus holds no solutions."""
+
+        if self.solutions is None:
+            return None
+        grids = unpack_solutions(self.solutions[index], self.n)
+        return grids[0] if isinstance(index, (int, np.integer)) else grids
+
+    def grid(self, index: int) -> list[list[str]]:
+        """Return puzzle index as read by Grider."""
+        return [[c or " " for c in row] for row in decode(self[index]).tolist()]
+
+
+def solve(grid: np.ndarray) -> tuple[np.ndarray | None, int, float]:
+    """Solve a uint8 grid natively, return the solution, nodes and time."""
+    import api
+
+    result = api.solve(decode(grid), "native", {"prefill": True})
+    sol = None if result.solution is None else encode(np.array(result.solution))
+    return sol, result.nodes, result.build_time + result.solve_time
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "files", nargs="+", help="puzzle files of the same size, see Grider.stream()"
+    )
+    parser.add_argument("-o", "--output", required=True, help="corpus file")
+    parser.add_argument(
+        "-s",
+        "--solve",
+        action="store_true",
+        help="solve the puzzles, store the solutions and METADATA records",
+    )
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="solving processes"
+    )
+
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    grids = np.concatenate([Grider.load_packed(f) for f in args.files])
+    solutions = meta = None
+    if args.solve:
+        with Pool(args.jobs) as pool:
+            results = pool.map(solve, grids, max(1, len(grids) // 64))
+        if any(sol is None for sol, _, _ in results):
+            raise SystemExit("some puzzles have no solution, not stored")
+        solutions = np.stack([sol for sol, _, _ in results])
+        meta = np.zeros(len(grids), dtype=METADATA)
+        meta["clues"] = np.count_nonzero(grids != EMPTY, axis=(1, 2))
+        meta["nodes"] = [nodes for _, nodes, _ in results]
+        meta["solve_time"] = [elapsed for _, _, elapsed in results]
+    write_corpus(args.output, grids, solutions, meta)
+    print(
+        f"wrote {len(grids)} puzzles to {args.output} "
+        f"in {time.perf_counter() - start:.3f} s"
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,197 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Solver daemon on a Unix socket, keeping NumPy, OR-Tools and Z3 loaded.
+
+Each request is one JSON line: {"grid": text, "backend": ..., "options":
+{...}} with the grid in the format of the puzzle files and the options of
+api.solve(), the reply is one JSON line with the fields of api.Result or
+an error. {"command": "stats"} returns the counters of the daemon and
+{"command": "shutdown"} stops it. A connection may send many requests.
+
+Connections are served by threads, the solves run in a pool of worker
+processes forked once the backends are imported, so several requests are
+solved at the same time and none pays for the imports. The workers keep
+their CP-SAT templates and Z3 sessions from one request to the next,
+except for the requests with a hint, which build their own model.
+Solutions are cached in the daemon, see cache.SolutionCache.
+"""
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import threading
+import time
+from dataclasses import asdict
+from multiprocessing import Pool
+
+import api
+from batch import load_backend
+from cache import SolutionCache
+
+SOCKET = "/tmp/binoxxo.sock"
+
+# statuses worth caching, the others depend on the options
+FINAL = ("solved", "unsolvable")
+
+
+def solve_task(grid: list[list[str]], backend: str, options: dict) -> dict:
+    """Solve a grid in a worker, return the fields of its Result."""
+    return asdict(api.solve(grid, backend, options))
+
+
+def ignore_interrupt() -> None:
+    """Leave Ctrl-C to the daemon, which lets the workers finish."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Handler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                reply = self.server.dispatch(json.loads(line))
+            except Exception as err:
+                reply = {"status": "error", "error": str(err)}
+            self.wfile.write((json.dumps(reply) + "\n").encode())
+
+
+class Daemon(socketserver.ThreadingUnixStreamServer):
+
+    daemon_threads = True
+
+    def __init__(self, path: str, jobs: int | None, cache: SolutionCache):
+        for backend in api.BACKENDS:
+            load_backend(backend)
+        self.pool = Pool(jobs, ignore_interrupt)
+        self.cache = cache
+        self.requests = 0
+        self.busy = 0
+        self.idle = threading.Condition()
+        self.start = time.perf_counter()
+        super().__init__(path, Handler)
+
+    def dispatch(self, request: dict) -> dict:
+        command = request.get("command", "solve")
+        if command == "stats":
+            return {
+                "requests": self.requests,
+                "busy": self.busy,
+                "uptime": time.perf_counter() - self.start,
+                "cache": self.cache.stats(),
+            }
+        if command == "shutdown":
+            # shutdown() waits for serve_forever() to return, not from its
+            # own thread
+            threading.Thread(target=self.shutdown).start()
+            return {"status": "stopping"}
+        if command != "solve":
+            raise ValueError(f"unknown command {command}")
+
+        backend = request.get("backend", "native")
+        options = request.get("options", {})
+        # the cache is the one of the daemon
+        if unknown := set(options) - (set(api.DEFAULTS) - {"cache"}):
+            raise ValueError(f"unknown options {', '.join(sorted(unknown))}")
+        if backend not in api.BACKENDS:
+            raise ValueError(f"unknown backend {backend}")
+        # checked before the cache answers, as api.solve() would
+        options = {"template": not options.get("hint"), **options}
+        api.with_defaults(options)
+        grid = api.as_grid(request["grid"])
+
+        with self.idle:
+            self.requests += 1
+            self.busy += 1
+        try:
+            start = time.perf_counter()
+            if options.get("count") is None:
+                found, sol = self.cache.get(grid)
+                if found:
+                    status = "unsolvable" if sol is None else "solved"
+                    result = api.Result(status, backend, sol, cached=True)
+                    result.solve_time = time.perf_counter() - start
+                    return asdict(result)
+            reply = self.pool.apply(solve_task, (grid, backend, options))
+            if options.get("count") is None and reply["status"] in FINAL:
+                self.cache.put(grid, reply["solution"])
+            return reply
+        finally:
+            with self.idle:
+                self.busy -= 1
+                self.idle.notify_all()
+
+    def close(self) -> None:
+        """Wait for the requests in progress, then release everything."""
+
+        with self.idle:
+            self.idle.wait_for(lambda: self.busy == 0)
+        self.server_close()
+        self.pool.close()
+        self.pool.join()
+        self.cache.close()
+        os.unlink(self.server_address)
+
+
+def remove_stale(path: str) -> None:
+    """Remove the socket left by a daemon that died, refuse to start if
+    one is still listening."""
+
+    if not os.path.exists(path):
+        return
+    if not stat.S_ISSOCK(os.stat(path).st_mode):
+        raise SystemExit(f"{path} is not a socket")
+    with socket.socket(socket.AF_UNIX) as s:
+        try:
+            s.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise SystemExit(f"a daemon is already listening on {path}")
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--socket", default=SOCKET, help="socket path")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=None, help="solving processes"
+    )
+    parser.add_argument(
+        "--cache", type=str, help="dbm file keeping the solutions across runs"
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=4096,
+        help="solutions kept in memory",
+    )
+
+    args = parser.parse_args()
+
+    remove_stale(args.socket)
+    daemon = Daemon(args.socket, args.jobs, SolutionCache(args.cache_size, args.cache))
+    signal.signal(
+        signal.SIGTERM, lambda *_: threading.Thread(target=daemon.shutdown).start()
+    )
+    print(f"listening on {args.socket}", flush=True)
+    try:
+        daemon.serve_forever()
+    finally:
+        daemon.close()
+        print("stopped", flush=True)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
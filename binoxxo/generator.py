@@ -0,0 +1,119 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Generates puzzles with a unique solution and few clues.
+
+A random full grid is built with the row-wise search, then clues are
+removed greedily in random order. A clue can go when the grid with the
+opposite value in its cell has no solution: the puzzle then stays unique.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+import rowsearch
+from bitboard import BitGrid
+from tools import save_grid
+
+
+def full_grid(n: int, rng: random.Random) -> BitGrid:
+    """Return a random valid full grid of side n."""
+
+    grid = BitGrid(n)
+    rowsearch.solve_grid(grid, rng)
+    return grid
+
+
+def remove_clues(grid: BitGrid, rng: random.Random) -> None:
+    """Empty the cells of a grid with a unique solution, in random order,
+    as long as the solution stays unique."""
+
+    n = grid.n
+    cells = [(i, j) for i in range(n) for j in range(n) if grid.row_filled[i] >> j & 1]
+    rng.shuffle(cells)
+    for i, j in cells:
+        v = "x" if grid.row_x[i] >> j & 1 else "o"
+        grid.clear(i, j)
+        grid.set(i, j, "o" if v == "x" else "x")
+        other = next(rowsearch.solutions(grid), None)
+        grid.clear(i, j)
+        if other is not None:
+            grid.set(i, j, v)
+
+
+def generate(n: int, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Return a puzzle of side n with a unique solution, and the solution."""
+
+    rng = random.Random(seed)
+    grid = full_grid(n, rng)
+    solution = grid.to_np()
+    remove_clues(grid, rng)
+    return grid.to_np(), solution
+
+
+def generate_file(task: tuple[int, int, str]) -> int:
+    """Generate one puzzle and write it, return its number of clues."""
+
+    n, seed, filename = task
+    puzzle, _ = generate(n, seed)
+    clues = np.count_nonzero(puzzle != "")
+    save_grid(filename, puzzle.tolist(), f"generated n={n} seed={seed} clues={clues}")
+    return clues
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--size", type=int, default=10, help="side of the grid")
+    parser.add_argument(
+        "-k", "--count", type=int, default=100, help="number of puzzles"
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, default="generated", help="output directory"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first puzzle")
+    parser.add_argument(
+        "-j", "--jobs", type=int, default=os.cpu_count(), help="number of processes"
+    )
+
+    args = parser.parse_args()
+
+    if args.size % 2:
+        parser.error("the side of the grid must be even")
+
+    os.makedirs(args.output, exist_ok=True)
+    tasks = [
+        (
+            args.size,
+            args.seed + k,
+            os.path.join(args.output, f"binoxxo_{args.size}_{args.seed + k:06d}.txt"),
+        )
+        for k in range(args.count)
+    ]
+
+    start = time.perf_counter()
+    with Pool(args.jobs) as pool:
+        clues = pool.map(generate_file, tasks, chunksize=1)
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"generated {len(tasks)} puzzles of {args.size}x{args.size} in {elapsed:.3f} s, "
+        f"{len(tasks) / elapsed:.1f} puzzles/s, "
+        f"{np.mean(clues):.1f} clues on average",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -4,14 +4,17 @@ BinOXXO Program Solver
 Rules for prefilling.
 """
 
-import numpy as np
+from collections import deque
 
+import numpy as np
 
-SIDE = 10
+# passes of the rules over a line in the last call to heuristics(), the
+# last pass of each line changes nothing
+iterations = 0
 
 
-def patterns_main(grid: np.ndarray) -> int:
-    """Do simple patterns across all rows.
+def patterns_line(line: np.ndarray) -> int:
+    """Do simple patterns along a single line.
     Return the number of changed items."""
 
     empty_two_o = ["", "o", "o"]
@@ -24,36 +27,45 @@ def patterns_main(grid: np.ndarray) -> int:
     x_empty_x = ["x", "", "x"]
 
     nb_changed = 0
-    for i in range(SIDE):
-        for j in range(SIDE - 2):
-            if (grid[i, j : j + 3] == empty_two_o).all():
-                grid[i, j] = "x"
-                nb_changed += 1
-            if (grid[i, j : j + 3] == two_o_empty).all():
-                grid[i, j + 2] = "x"
-                nb_changed += 1
-            if (grid[i, j : j + 3] == empty_two_x).all():
-                grid[i, j] = "o"
-                nb_changed += 1
-            if (grid[i, j : j + 3] == two_x_empty).all():
-                grid[i, j + 2] = "o"
-                nb_changed += 1
-            if (grid[i, j : j + 3] == o_empty_o).all():
-                grid[i, j + 1] = "x"
-                nb_changed += 1
-            if (grid[i, j : j + 3] == x_empty_x).all():
-                grid[i, j + 1] = "o"
-                nb_changed += 1
+    for j in range(len(line) - 2):
+        # every pattern holds exactly one empty cell
+        w = line[j : j + 3].tolist()
+        if w.count("") != 1:
+            continue
+        if w == empty_two_o:
+            line[j] = "x"
+            nb_changed += 1
+        elif w == two_o_empty:
+            line[j + 2] = "x"
+            nb_changed += 1
+        elif w == empty_two_x:
+            line[j] = "o"
+            nb_changed += 1
+        elif w == two_x_empty:
+            line[j + 2] = "o"
+            nb_changed += 1
+        elif w == o_empty_o:
+            line[j + 1] = "x"
+            nb_changed += 1
+        elif w == x_empty_x:
+            line[j + 1] = "o"
+            nb_changed += 1
     return nb_changed
 
 
+def patterns_main(grid: np.ndarray) -> int:
+    """Do simple patterns across all rows.
+    Return the number of changed items."""
+    return sum(patterns_line(grid[i, :]) for i in range(grid.shape[0]))
+
+
 def patterns(grid: np.ndarray) -> int:
     """Fill simple patterns across all columns by transposing the grid.
     Return the number of changed items."""
     nb_changed = patterns_main(grid)
 
     grid = grid.T
-    nb_changed = patterns_main(grid)
+    nb_changed += patterns_main(grid)
     grid = grid.T
     return nb_changed
 
@@ -61,15 +73,16 @@ def patterns(grid: np.ndarray) -> int:
 def fill_single(gridline: np.ndarray, e: str) -> int | None:
     """Fill a single gridline (line or colum)."""
 
+    n = len(gridline)
     if gridline[0] == "" and gridline[1] != "":
         gridline[0] = e
         return 1
 
-    if gridline[SIDE - 1] == "" and gridline[SIDE - 2] != "":
-        gridline[SIDE - 1] = e
+    if gridline[n - 1] == "" and gridline[n - 2] != "":
+        gridline[n - 1] = e
         return 1
 
-    for i in range(1, SIDE - 1):
+    for i in range(1, n - 1):
         # print("> ", gridline[i-1], gridline[i], gridline[i+1])
         if gridline[i - 1] != "" and gridline[i] == "" and gridline[i + 1] != "":
             gridline[i] = e
@@ -84,22 +97,26 @@ def count(gridline: np.ndarray) -> tuple[int]:
 
     x = np.isin(gridline, "x").sum()
     o = np.isin(gridline, "o").sum()
-    return x, o, SIDE - x - o
+    return x, o, len(gridline) - x - o
 
 
-def singles_main(grid: np.ndarray) -> int:
-    nb_changed = 0
+def singles_line(line: np.ndarray) -> int:
+    """Fill the empty cells of a line holding half of one symbol with the
+    other one. Return the number of filled cells."""
+    half = len(line) // 2
 
-    for i in range(SIDE):
-        x, o, empty = count(grid[i, :])
-        if o == 5 and empty > 0:
-            grid[i, grid[i, :] == ""] = "x"
-            nb_changed += 1
-        elif x == 5 and empty > 0:
-            grid[i, grid[i, :] == ""] = "o"
-            nb_changed += 1
+    x, o, empty = count(line)
+    if o == half and empty > 0:
+        line[line == ""] = "x"
+        return int(empty)
+    elif x == half and empty > 0:
+        line[line == ""] = "o"
+        return int(empty)
+    return 0
 
-    return nb_changed
+
+def singles_main(grid: np.ndarray) -> int:
+    return sum(singles_line(grid[i, :]) for i in range(grid.shape[0]))
 
 
 def singles(grid: np.ndarray) -> int:
@@ -112,7 +129,8 @@ def singles(grid: np.ndarray) -> int:
     return nb_changed
 
 
-def triplets_main(grid: np.ndarray) -> int:
+def triplets_line(line: np.ndarray) -> int:
+    """Return the number of filled cells."""
 
     p1 = ["x", "", ""]
     p2 = ["", "", "x"]
@@ -120,32 +138,32 @@ def triplets_main(grid: np.ndarray) -> int:
     p4 = ["o", "", ""]
     triple_space = ["", "", ""]
 
-    nb_changed = 0
+    n = len(line)
+    half = n // 2
+    nb_empty = np.count_nonzero(line == "")
+
+    not_triple_space = True
+    for j in range(n - 2):
+        if (line[j : j + 3] == triple_space).all():
+            not_triple_space = False
+
+    if not_triple_space:
+        x, o, empty = count(line)
+        if x == half - 2 and o == half - 1:
+            for j in range(n - 2):
+                if (line[j : j + 3] == p1).all() or (line[j : j + 3] == p2).all():
+                    fill_single(line, "x")
+                    break
+        elif x == half - 1 and o == half - 2:
+            for j in range(n - 2):
+                if (line[j : j + 3] == p3).all() or (line[j : j + 3] == p4).all():
+                    fill_single(line, "o")
+                    break
+    return int(nb_empty - np.count_nonzero(line == ""))
 
-    for i in range(SIDE):
-
-        not_triple_space = True
-        for j in range(SIDE - 2):
-            if (grid[i, j : j + 3] == triple_space).all():
-                not_triple_space = False
-
-        if not_triple_space:
-            x, o, empty = count(grid[i, :])
-            if x == 3 and o == 4:
-                for j in range(SIDE - 2):
-                    if (grid[i, j : j + 3] == p1).all() or (
-                        grid[i, j : j + 3] == p2
-                    ).all():
-                        nb_changed += fill_single(grid[i, :], "x")
-                        break
-            elif x == 4 and o == 3:
-                for j in range(SIDE - 2):
-                    if (grid[i, j : j + 3] == p3).all() or (
-                        grid[i, j : j + 3] == p4
-                    ).all():
-                        nb_changed += fill_single(grid[i, :], "o")
-                        break
-    return nb_changed
+
+def triplets_main(grid: np.ndarray) -> int:
+    return sum(triplets_line(grid[i, :]) for i in range(grid.shape[0]))
 
 
 def triplets(grid: np.ndarray) -> int:
@@ -158,48 +176,53 @@ def triplets(grid: np.ndarray) -> int:
     return nb_changed
 
 
-def quintuplets_main(grid: np.ndarray) -> int:
+def quintuplets_line(line: np.ndarray) -> int:
 
     p1 = ["x", "", "", "", "x"]
     p2 = ["o", "", "", "", "o"]
     p3 = ["o", "", "", "", "x"]
     p4 = ["x", "", "", "", "o"]
 
+    n = len(line)
+    half = n // 2
     nb_changed = 0
 
-    for i in range(SIDE):
-        x, o, empty = count(grid[i, :])
-        if x == 3 and o == 4:
-            for j in range(SIDE - 4):
-                if (grid[i, j : j + 5] == p1).all():
-                    grid[i, j + 2] = "o"  # ['x','','o','','x']
-                    nb_changed += 1
-                    break
-                if (grid[i, j : j + 5] == p3).all():
-                    grid[i, j + 1] = "x"  # ['o','x','','','x']
-                    nb_changed += 1
-                    break
-                if (grid[i, j : j + 5] == p4).all():
-                    grid[i, j + 3] = "x"  # ['x','','','x','o']
-                    nb_changed += 1
-                    break
-        elif o == 3 and x == 4:
-            for j in range(SIDE - 4):
-                if (grid[i, j : j + 5] == p2).all():
-                    grid[i, j + 2] = "x"  # ['o','','x','','o']
-                    nb_changed += 1
-                    break
-                if (grid[i, j : j + 5] == p3).all():
-                    grid[i, j + 3] = "o"  # ['o','','','o','x']
-                    nb_changed += 1
-                    break
-                if (grid[i, j : j + 5] == p4).all():
-                    grid[i, j + 1] = "o"  # ['x','o','','','o']
-                    nb_changed += 1
-                    break
+    x, o, empty = count(line)
+    if x == half - 2 and o == half - 1:
+        for j in range(n - 4):
+            if (line[j : j + 5] == p1).all():
+                line[j + 2] = "o"  # ['x','','o','','x']
+                nb_changed += 1
+                break
+            if (line[j : j + 5] == p3).all():
+                line[j + 1] = "x"  # ['o','x','','','x']
+                nb_changed += 1
+                break
+            if (line[j : j + 5] == p4).all():
+                line[j + 3] = "x"  # ['x','','','x','o']
+                nb_changed += 1
+                break
+    elif o == half - 2 and x == half - 1:
+        for j in range(n - 4):
+            if (line[j : j + 5] == p2).all():
+                line[j + 2] = "x"  # ['o','','x','','o']
+                nb_changed += 1
+                break
+            if (line[j : j + 5] == p3).all():
+                line[j + 3] = "o"  # ['o','','','o','x']
+                nb_changed += 1
+                break
+            if (line[j : j + 5] == p4).all():
+                line[j + 1] = "o"  # ['x','o','','','o']
+                nb_changed += 1
+                break
     return nb_changed
 
 
+def quintuplets_main(grid: np.ndarray) -> int:
+    return sum(quintuplets_line(grid[i, :]) for i in range(grid.shape[0]))
+
+
 def quintuplets(grid: np.ndarray) -> int:
     nb_changed = quintuplets_main(grid)
 
@@ -210,15 +233,44 @@ def quintuplets(grid: np.ndarray) -> int:
     return nb_changed
 
 
-def heuristics(grid: np.ndarray) -> None:
-    """Main entry point to heuristics."""
+RULES = [patterns_line, singles_line, triplets_line, quintuplets_line]
+
+
+def heuristics(grid: np.ndarray) -> int:
+    """Main entry point to heuristics.
+
+    Keep a queue of the rows and columns touched since they were last
+    examined, apply the rules to them only.
+    Return the number of filled cells."""
+
+    global iterations
+    iterations = 0
+    n = grid.shape[0]
+    queue = deque([(0, i) for i in range(n)] + [(1, j) for j in range(n)])
+    queued = set(queue)
+    nb_filled = 0
+
+    while queue:
+        axis, k = queue.popleft()
+        queued.discard((axis, k))
+        line = grid[k, :] if axis == 0 else grid[:, k]
+        empty = line == ""
+
+        # full lines and lines with less than two symbols trigger no rule
+        if not 2 <= n - np.count_nonzero(empty) < n:
+            continue
+
+        # if no rule has changed something, the line is done
+        changed = True
+        while changed:
+            iterations += 1
+            changed = sum(rule(line) for rule in RULES)
 
-    while True:
-        s = patterns(grid)
-        s += singles(grid)
-        s += triplets(grid)
-        s += quintuplets(grid)
+        # the crossing lines of the filled cells are dirty
+        for m in np.flatnonzero(empty & (line != "")):
+            nb_filled += 1
+            if (1 - axis, m) not in queued:
+                queue.append((1 - axis, m))
+                queued.add((1 - axis, m))
 
-        # if no rule has changed something, abort!
-        if s == 0:
-            break
+    return nb_filled
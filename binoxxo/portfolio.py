@@ -0,0 +1,164 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Races the backends on each puzzle and keeps the first answer.
+
+Every backend runs in its own process on the same puzzle: the native
+search with prefill, CP-SAT and Z3. The first one to solve the puzzle or
+prove it unsolvable wins, the others are killed. The winner is logged,
+one JSON line per puzzle is written as in batch.py.
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from collections import Counter
+from queue import Empty
+
+import api
+from batch import BACKENDS, load_backend, load_grid, puzzle_files
+
+# statuses that settle a puzzle, any other lets the race go on
+FINAL = ("solved", "unsolvable", "invalid")
+
+
+def run(backend: str, grid: list[list[str]], options: dict, queue: mp.Queue) -> None:
+    """Solve the puzzle with one backend, put the outcome on the queue."""
+
+    start = time.perf_counter()
+    try:
+        result = api.solve(grid, backend, options)
+        status, sol = result.status, result.solution
+    except Exception as err:
+        status, sol = f"error: {err}", None
+    queue.put((backend, status, sol, time.perf_counter() - start))
+
+
+def race(
+    filename: str, backends: list[str], options: dict, timeout: float | None = None
+) -> dict:
+    """Start every backend on the puzzle, return the record of the first
+    final answer. The losers are killed."""
+
+    grid = load_grid(filename)
+    queue = mp.Queue()
+    processes = [
+        mp.Process(target=run, args=(b, grid, options, queue), daemon=True)
+        for b in backends
+    ]
+    start = time.perf_counter()
+    for p in processes:
+        p.start()
+
+    record = {"file": filename, "winner": None, "status": "unknown", "solution": None}
+    try:
+        for _ in processes:
+            remaining = None
+            if timeout is not None:
+                remaining = max(0, timeout - (time.perf_counter() - start))
+            try:
+                backend, status, sol, elapsed = queue.get(timeout=remaining)
+            except Empty:
+                record["status"] = "timeout"
+                break
+            if status in FINAL:
+                record["winner"] = backend
+                record["status"] = status
+                record["solution"] = ["".join(row) for row in sol] if sol else None
+                record["solve_time"] = round(elapsed, 6)
+                break
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.kill()
+            p.join()
+    record["time"] = round(time.perf_counter() - start, 6)
+    return record
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "inputs", nargs="*", help="puzzle files, directories or glob patterns"
+    )
+    parser.add_argument(
+        "-l",
+        "--list",
+        action="append",
+        default=[],
+        help="file listing one puzzle file per line",
+    )
+    parser.add_argument(
+        "-b",
+        "--backend",
+        choices=BACKENDS,
+        action="append",
+        help="backends in the race, default: all",
+    )
+    parser.add_argument(
+        "-o", "--output", type=str, help="JSON lines output file, default stdout"
+    )
+    parser.add_argument(
+        "-t", "--timeout", type=float, help="give up on a puzzle after TIMEOUT s"
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["numpy", "bitboard", "rows"],
+        default="rows",
+        help="grid representation used by the native search",
+    )
+    parser.add_argument(
+        "-m",
+        "--model",
+        choices=["int", "bool"],
+        default="bool",
+        help="cell variables of the CP-SAT and Z3 models",
+    )
+
+    args = parser.parse_intermixed_args()
+
+    backends = args.backend or BACKENDS
+    options = {"prefill": True, "engine": args.engine, "model": args.model}
+
+    # import the backends once, the forked racers inherit them
+    for backend in backends:
+        load_backend(backend)
+
+    out = open(args.output, "w") if args.output else sys.stdout
+    wins = Counter()
+    start = time.perf_counter()
+    files = puzzle_files(args.inputs, args.list)
+    for filename in files:
+        try:
+            record = race(filename, backends, options, args.timeout)
+        except (OSError, ValueError) as err:
+            record = {"file": filename, "winner": None, "status": "error"}
+            record["error"] = str(err)
+        wins[record["winner"]] += 1
+        winner = f" by {record['winner']}" if record["winner"] else ""
+        print(
+            f"{filename}: {record['status']}{winner} in {record.get('time', 0):.3f} s",
+            file=sys.stderr,
+        )
+        out.write(json.dumps(record) + "\n")
+    if out is not sys.stdout:
+        out.close()
+
+    print(
+        f"raced {len(files)} puzzles in {time.perf_counter() - start:.3f} s, wins: "
+        + ", ".join(f"{b} {wins[b]}" for b in backends),
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
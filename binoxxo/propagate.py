@@ -0,0 +1,209 @@
+#! env python
+
+"""
+BinOXXO Program Solver
+
+Rules for prefilling a whole batch of grids at once.
+
+The grids are stacked in a uint8 array of shape (K, n, n) coded with
+EMPTY, O and X from tools. Each rule of heuristics.py is matched on all
+windows of all rows of all grids with a few array operations, columns
+are handled on the transposed view. A forced cell is coded as the value
+it must take, O | X marks a cell forced both ways, i.e. a contradiction.
+"""
+
+import argparse
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from tools import EMPTY, O, X, Grider
+
+
+def window_codes(grids: np.ndarray, k: int) -> np.ndarray:
+    """Return the base-3 code of every window of k cells along the rows."""
+    w = sliding_window_view(grids, k, axis=-1)
+    return w @ (3 ** np.arange(k - 1, -1, -1))
+
+
+def code(*cells: int) -> int:
+    return sum(c * 3**i for i, c in enumerate(reversed(cells)))
+
+
+def table(k: int, actions: dict[tuple, tuple[int, int]]) -> tuple[np.ndarray]:
+    """Turn {window: (offset, value)} into lookup arrays indexed by code."""
+
+    offsets = np.full(3**k, -1, dtype=np.int8)
+    values = np.zeros(3**k, dtype=np.uint8)
+    for cells, (offset, value) in actions.items():
+        offsets[code(*cells)] = offset
+        values[code(*cells)] = value
+    return offsets, values
+
+
+E = EMPTY
+
+PATTERNS = table(
+    3,
+    {
+        (E, O, O): (0, X),
+        (O, O, E): (2, X),
+        (E, X, X): (0, O),
+        (X, X, E): (2, O),
+        (O, E, O): (1, X),
+        (X, E, X): (1, O),
+    },
+)
+
+# three cells left: two x and one o
+QUINTUPLETS_X = table(
+    5,
+    {
+        (X, E, E, E, X): (2, O),
+        (O, E, E, E, X): (1, X),
+        (X, E, E, E, O): (3, X),
+    },
+)
+
+# three cells left: two o and one x
+QUINTUPLETS_O = table(
+    5,
+    {
+        (O, E, E, E, O): (2, X),
+        (O, E, E, E, X): (3, O),
+        (X, E, E, E, O): (1, O),
+    },
+)
+
+
+def scatter(codes: np.ndarray, lut: tuple[np.ndarray], n: int) -> np.ndarray:
+    """Return the cells forced by the windows matching the lookup table."""
+
+    offsets, values = lut[0][codes], lut[1][codes]
+    forced = np.zeros(codes.shape[:-1] + (n,), dtype=np.uint8)
+    m = codes.shape[-1]
+    for offset in range(n - m + 1):
+        hit = offsets == offset
+        if hit.any():
+            forced[..., offset : offset + m] |= np.where(hit, values, 0)
+    return forced
+
+
+def isolated(empty: np.ndarray) -> np.ndarray:
+    """Return the empty cells whose neighbours are filled or off the line."""
+
+    padded = np.pad(empty, [(0, 0)] * (empty.ndim - 1) + [(1, 1)])
+    return empty & ~padded[..., :-2] & ~padded[..., 2:]
+
+
+def forced_rows(grids: np.ndarray) -> np.ndarray:
+    """Apply every rule to the rows of the grids, return the forced cells."""
+
+    n = grids.shape[-1]
+    half = n // 2
+    empty = grids == EMPTY
+    nx = np.count_nonzero(grids == X, axis=-1)[..., None]
+    no = np.count_nonzero(grids == O, axis=-1)[..., None]
+
+    # patterns: two in a row, or a gap between two identical symbols
+    codes3 = window_codes(grids, 3)
+    forced = scatter(codes3, PATTERNS, n)
+
+    # singles: half of the line already holds one symbol
+    forced |= np.where(empty & (no == half), X, 0).astype(np.uint8)
+    forced |= np.where(empty & (nx == half), O, 0).astype(np.uint8)
+
+    # triplets: the symbol needed once sits in a pair next to the other,
+    # the isolated empty cell takes the symbol needed twice
+    no_gap = ~(codes3 == code(E, E, E)).any(axis=-1, keepdims=True)
+    needs_x = (nx == half - 2) & (no == half - 1)
+    needs_o = (no == half - 2) & (nx == half - 1)
+    next_x = np.isin(codes3, [code(X, E, E), code(E, E, X)]).any(-1, keepdims=True)
+    next_o = np.isin(codes3, [code(O, E, E), code(E, E, O)]).any(-1, keepdims=True)
+    single = isolated(empty)
+    forced |= np.where(single & no_gap & needs_x & next_x, X, 0).astype(np.uint8)
+    forced |= np.where(single & no_gap & needs_o & next_o, O, 0).astype(np.uint8)
+
+    # quintuplets: three empty cells framed by two symbols
+    if n >= 5:
+        codes5 = window_codes(grids, 5)
+        forced |= scatter(np.where(needs_x, codes5, 0), QUINTUPLETS_X, n)
+        forced |= scatter(np.where(needs_o, codes5, 0), QUINTUPLETS_O, n)
+
+    return forced
+
+
+def forced_cells(grids: np.ndarray) -> np.ndarray:
+    """Apply every rule to the rows and the columns of the grids."""
+
+    forced = forced_rows(grids)
+    forced |= forced_rows(grids.transpose(0, 2, 1)).transpose(0, 2, 1)
+    forced[grids != EMPTY] = 0
+    return forced
+
+
+def propagate(grids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Prefill a stack of grids in place, each up to its fixpoint.
+
+    Return the number of cells filled per grid and whether the rules
+    found a contradiction in it."""
+
+    k = grids.shape[0]
+    filled = np.zeros(k, dtype=np.int64)
+    conflict = np.zeros(k, dtype=bool)
+
+    active = np.arange(k)
+    while active.size:
+        sub = grids[active]
+        forced = forced_cells(sub)
+
+        clash = (forced == O | X).any(axis=(1, 2))
+        conflict[active[clash]] = True
+        forced[clash] = 0
+
+        changed = np.count_nonzero(forced, axis=(1, 2))
+        grids[active] = np.where(forced != 0, forced, sub)
+        filled[active] += changed
+        active = active[changed > 0]
+
+    return filled, conflict
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "files",
+        nargs="+",
+        help="puzzle files of the same size, each holding one or many puzzles",
+    )
+
+    args = parser.parse_args()
+
+    packed = [Grider.load_packed(f) for f in args.files]
+    names = [
+        f if len(g) == 1 else f"{f}:{i}"
+        for f, g in zip(args.files, packed)
+        for i in range(len(g))
+    ]
+    grids = np.concatenate(packed)
+    empty = np.count_nonzero(grids == EMPTY)
+
+    start = time.perf_counter()
+    filled, conflict = propagate(grids)
+    elapsed = time.perf_counter() - start
+
+    for f, nb, clash in zip(names, filled, conflict):
+        print(f"{f}: {nb} cells filled{', contradiction' if clash else ''}")
+    print(
+        f"prefilled {len(grids)} grids, {filled.sum()}/{empty} empty cells, "
+        f"in {elapsed:.3f} s"
+    )
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,220 @@
+"""
+BinOXXO Program Solver
+
+Row-wise search over the precomputed table of legal lines.
+
+A legal line is balanced and has no three identical symbols in a row.
+The search assigns whole rows, top to bottom, choosing among the legal
+lines that match the clues of each row. Columns are pruned on their
+prefix: it must start one of the legal lines matching the clues of the
+column.
+"""
+
+import random
+from collections.abc import Iterator
+from functools import lru_cache
+from itertools import islice
+
+from bitboard import BitGrid
+
+# search statistics of the last search: nodes visited, assignments undone
+# and deepest level reached
+nodes = backtracks = max_depth = 0
+
+# nodes of the first try of a random search, grown by half at each restart
+RESTART = 300
+
+
+@lru_cache
+def legal_lines(n: int) -> tuple[int, ...]:
+    """Return the x masks of all legal lines of length n, bit j is cell j."""
+
+    half = n // 2
+    lines = []
+
+    def extend(xs: int, j: int, nx: int, no: int) -> None:
+        if j == n:
+            lines.append(xs)
+            return
+        for v in [0, 1]:
+            if v and nx == half or not v and no == half:
+                continue
+            # the two previous cells hold the same symbol as v
+            if j >= 2 and (xs >> (j - 1) & 1) == v and (xs >> (j - 2) & 1) == v:
+                continue
+            extend(xs | v << j, j + 1, nx + v, no + 1 - v)
+
+    extend(0, 0, 0, 0)
+    return tuple(lines)
+
+
+# the tables of the clue masks of a puzzle are seldom met again in the
+# next one, a few are enough for the lines changing during a search: a
+# prefix table of side 20 alone weighs about 3 MB
+@lru_cache(maxsize=256)
+def matching_lines(n: int, filled: int, xs: int) -> tuple[int, ...]:
+    """Return the legal lines of length n matching the clues of a line."""
+    return tuple(line for line in legal_lines(n) if (line ^ xs) & filled == 0)
+
+
+@lru_cache(maxsize=64)
+def prefix_table(n: int, filled: int, xs: int) -> list[dict[int, int]]:
+    """Map, for each length k, the k-bit prefixes of the lines matching the
+    clues to their single completion, or to -1 when there are several."""
+
+    table = [{} for _ in range(n + 1)]
+    for line in matching_lines(n, filled, xs):
+        for k in range(n + 1):
+            prefix = line & ((1 << k) - 1)
+            table[k][prefix] = -1 if prefix in table[k] else line
+    return table
+
+
+@lru_cache(maxsize=4096)
+def line_fill(n: int, filled: int, xs: int) -> tuple[int, int] | None:
+    """Return the filled and x masks of a line once the cells on which all
+    matching legal lines agree are set, or None if no legal line matches."""
+
+    lines = matching_lines(n, filled, xs)
+    if not lines:
+        return None
+    same = (1 << n) - 1
+    for line in lines[1:]:
+        same &= ~(line ^ lines[0])
+    return same, lines[0] & same
+
+
+def settle(grid: BitGrid) -> BitGrid | None:
+    """Return a copy of the grid with the cells forced by single lines set,
+    up to the fixpoint, or None if a line cannot be completed."""
+
+    grid = grid.copy()
+    n = grid.n
+    changed = True
+    while changed:
+        changed = False
+        for i in range(n):
+            fill = line_fill(n, grid.row_filled[i], grid.row_x[i])
+            if fill is None:
+                return None
+            for j in range(n):
+                if (fill[0] & ~grid.row_filled[i]) >> j & 1:
+                    grid.set(i, j, "x" if fill[1] >> j & 1 else "o")
+                    changed = True
+        for j in range(n):
+            fill = line_fill(n, grid.col_filled[j], grid.col_x[j])
+            if fill is None:
+                return None
+            for i in range(n):
+                if (fill[0] & ~grid.col_filled[j]) >> i & 1:
+                    grid.set(i, j, "x" if fill[1] >> i & 1 else "o")
+                    changed = True
+    return grid
+
+
+def solutions(
+    grid: BitGrid, rng: random.Random | None = None, budget: int = 0
+) -> Iterator[list[int]]:
+    """Yield the solutions of the grid as lists of row x masks.
+
+    With rng, the candidate lines of each row are tried in random order.
+    With a budget, the search stops once it has visited that many nodes."""
+
+    global nodes, backtracks, max_depth
+    nodes = backtracks = max_depth = 0
+    n = grid.n
+    # cells forced by single lines prune the search before it starts
+    grid = settle(grid)
+    if grid is None:
+        return
+    candidates = [matching_lines(n, f, x) for f, x in zip(grid.row_filled, grid.row_x)]
+    if rng:
+        candidates = [rng.sample(c, len(c)) for c in candidates]
+    prefixes = [prefix_table(n, f, x) for f, x in zip(grid.col_filled, grid.col_x)]
+    yield from solve_from(grid, candidates, prefixes, [], [0] * n, set(), budget)
+
+
+def solve_grid(grid: BitGrid, rng: random.Random | None = None) -> bool:
+    """Entry point to the row-wise solver, fills the grid when solved.
+
+    With rng, the run time is heavy tailed: a bad choice in the first rows
+    can take very long to undo. The search is restarted with the lines
+    shuffled again once it has visited a budget of nodes, grown by half at
+    each restart so that it still ends when there is no solution."""
+
+    budget = RESTART if rng else 0
+    while True:
+        chosen = next(solutions(grid, rng, budget), None)
+        if chosen is not None or not budget or nodes <= budget:
+            break
+        budget += budget // 2
+    if chosen is None:
+        return False
+    for i, line in enumerate(chosen):
+        grid.set_row(i, line)
+    return True
+
+
+def count_solutions(grid: BitGrid, cap: int | None = None) -> int:
+    """Return the number of solutions, stopping at cap if given."""
+    return sum(1 for _ in islice(solutions(grid), cap or None))
+
+
+def solve_from(
+    grid: BitGrid,
+    candidates: list[tuple[int, ...]],
+    prefixes: list[list[dict[int, int]]],
+    chosen: list[int],
+    cols: list[int],
+    used: set[int],
+    budget: int = 0,
+) -> Iterator[list[int]]:
+    """Assign the rows from len(chosen) on, yield every full assignment.
+
+    cols holds the columns built so far from the chosen rows, bit i is row i.
+    Past budget nodes, if not 0, nothing more is searched.
+    """
+
+    global nodes, backtracks, max_depth
+    nodes += 1
+    if budget and nodes > budget:
+        return
+    n = grid.n
+    k = len(chosen)
+    if k > max_depth:
+        max_depth = k
+
+    # columns left with a single completion must be distinct
+    forced = [prefixes[j][k][col] for j, col in enumerate(cols)]
+    forced = [col for col in forced if col != -1]
+    if len(set(forced)) < len(forced):
+        return
+    if k == n:
+        # rows are legal and distinct, columns are legal by construction
+        yield list(chosen)
+        return
+
+    # columns whose prefix can be extended by an x or by an o
+    allow_x = allow_o = 0
+    for j, col in enumerate(cols):
+        if col | 1 << k in prefixes[j][k + 1]:
+            allow_x |= 1 << j
+        if col in prefixes[j][k + 1]:
+            allow_o |= 1 << j
+    must_x = grid.full & ~allow_o
+
+    for line in candidates[k]:
+        if line in used or line & ~allow_x or must_x & ~line:
+            continue
+        chosen.append(line)
+        used.add(line)
+        for j in range(n):
+            cols[j] |= (line >> j & 1) << k
+        yield from solve_from(grid, candidates, prefixes, chosen, cols, used, budget)
+        backtracks += 1
+        for j in range(n):
+            cols[j] &= ~(1 << k)
+        used.discard(line)
+        chosen.pop()
+        if budget and nodes > budget:
+            return
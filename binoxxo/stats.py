@@ -0,0 +1,104 @@
+"""
+BinOXXO Program Solver
+
+Counters and timers of the native engine, exported as JSON.
+
+The search engines and heuristics always keep their cheap counters:
+nodes, backtracks and max_depth per engine, iterations in heuristics.
+Timing the validity checks and the rules costs a clock read per call, so
+the timers are only wrapped around them by enable(): with the stats off
+the code runs unchanged.
+"""
+
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from functools import wraps
+
+enabled = False
+
+# validity checks of the numpy engine: the whole grid before the search,
+# each placement during it, the options of each cell in the mcv order,
+# whose calls and time include its own placement checks
+CHECKS = ["grid_is_valid", "placement_is_valid", "cell_options"]
+
+# per instrumented function: calls, cells filled (rules only) and seconds
+calls = defaultdict(int)
+hits = defaultdict(int)
+seconds = defaultdict(float)
+
+
+def timed(name: str, func: Callable, count_hits: bool = False) -> Callable:
+    """Wrap func to count its calls and time, and the cells it fills."""
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        seconds[name] += time.perf_counter() - start
+        calls[name] += 1
+        if count_hits:
+            hits[name] += result
+        return result
+
+    return wrapper
+
+
+def enable() -> None:
+    """Install the timers, once per process."""
+
+    global enabled
+    if enabled:
+        return
+    import binoxxo
+    import heuristics
+
+    for name in CHECKS:
+        setattr(binoxxo, name, timed(name, getattr(binoxxo, name)))
+    heuristics.RULES[:] = [
+        timed(rule.__name__.removesuffix("_line"), rule, count_hits=True)
+        for rule in heuristics.RULES
+    ]
+    enabled = True
+
+
+def reset() -> None:
+    """Clear the timers and the counters of the engines."""
+    import binoxxo
+    import bitboard
+    import heuristics
+    import rowsearch
+
+    calls.clear()
+    hits.clear()
+    seconds.clear()
+    for module in (binoxxo, bitboard, rowsearch):
+        module.nodes = module.backtracks = module.max_depth = 0
+    heuristics.iterations = 0
+
+
+def native(engine: str) -> dict:
+    """Return the statistics of the last native solve with engine."""
+    import binoxxo
+    import bitboard
+    import heuristics
+    import rowsearch
+
+    module = {"numpy": binoxxo, "bitboard": bitboard, "rows": rowsearch}[engine]
+    rules = [rule.__name__.removesuffix("_line") for rule in heuristics.RULES]
+    return {
+        "search": {
+            "engine": engine,
+            "nodes": module.nodes,
+            "backtracks": module.backtracks,
+            "max_depth": module.max_depth,
+        },
+        "heuristics": {
+            "iterations": heuristics.iterations,
+            "rules": {
+                name: {"calls": calls[name], "hits": hits[name], "time": seconds[name]}
+                for name in rules
+            },
+        },
+        **{name: {"calls": calls[name], "time": seconds[name]} for name in CHECKS},
+    }
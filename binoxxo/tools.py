@@ -1,37 +1,78 @@
+from collections.abc import Iterator
+from math import isqrt
+from typing import BinaryIO
+
 import numpy as np
 
+# Integer codes of the cells in packed uint8 grids.
+EMPTY, O, X = 0, 1, 2
+
+# code of each byte of a puzzle text, 255 for bytes that are not cells
+CODES = np.full(256, 255, dtype=np.uint8)
+CODES[list(b"- ")] = EMPTY
+CODES[list(b"oO")] = O
+CODES[list(b"xX")] = X
+
+
+def parse_grid(text: str) -> list[list[str]]:
+    """Read a text, ignoring comments and empty lines,
+    return as a list of list of strings, " " for empty cells.
+    Raise ValueError if the text does not hold a square grid."""
+
+    s = [
+        line.strip()
+        for line in text.splitlines()
+        if not line.startswith("#") and not len(line) == 0 and not line.isspace()
+    ]
+
+    s = "".join(s).replace("-", " ").lower()
+    n = int(np.sqrt(len(s)))
+    if n == 0 or n * n != len(s):
+        raise ValueError(f"{len(s)} cells do not make a square grid")
+    if set(s) - {"o", "x", " "}:
+        raise ValueError(f"unknown cells {''.join(sorted(set(s) - {'o', 'x', ' '}))}")
+    return [[s[i] for i in range(j * n, j * n + n)] for j in range(n)]
+
 
 class Grider:
 
     def __init__(self, filename: str):
-        """Read a text, ignoring comments and empty lines,
-        return as a list of list of strings."""
-
-        try:
-            with open(filename) as f:
-                s = f.readlines()
-
-            s = [
-                line.strip()
-                for line in s
-                if not line.startswith("#")
-                and not len(line) == 0
-                and not line.isspace()
-            ]
-
-            s = "".join(s).replace("-", " ").lower()
-            n = int(np.sqrt(len(s)))
-            self.grid = [[s[i] for i in range(j * n, j * n + n)] for j in range(n)]
-        except Exception as err:
-            print(err)
-            exit(1)
+        """Read a grid file, see parse_grid().
+        Raise OSError or ValueError if it cannot be read."""
+
+        with open(filename) as f:
+            self.grid = parse_grid(f.read())
 
     def as_np(self) -> np.array:
-        g =  np.array(self.grid)
-        g[g == " "] = ""
-        return g
+        return to_np(self.grid)
+
+    @staticmethod
+    def stream(filename: str, n: int | None = None) -> Iterator[list[list[str]]]:
+        """Yield the grids of a file holding many puzzles one at a time,
+        see read_cells(). Raise OSError or ValueError as Grider."""
+
+        with open(filename, "rb") as f:
+            for cells in read_cells(f, n):
+                yield parse_grid(cells.decode("latin-1"))
+
+    @staticmethod
+    def load_packed(filename: str, n: int | None = None) -> np.ndarray:
+        """Read all the puzzles of a file, see read_cells(), into a uint8
+        array of shape (K, n, n) coded with EMPTY, O and X. Only the cells
+        are kept while reading, one byte each."""
 
-    def print_grid(self, grid: list[list[str]]) -> None:
+        cells = bytearray()
+        with open(filename, "rb") as f:
+            for puzzle in read_cells(f, n):
+                cells += puzzle
+                n = isqrt(len(puzzle))
+        grids = CODES[np.frombuffer(cells, dtype=np.uint8)]
+        if (grids == 255).any():
+            raise ValueError(f"unknown cells in {filename}")
+        return grids.reshape(-1, n or 0, n or 0)
+
+    @staticmethod
+    def print_grid(grid: list[list[str]]) -> None:
         """Print a grid nicely."""
 
         n = len(grid)
@@ -45,5 +86,69 @@ class Grider:
             print("")
         print("")
         
-    def print_np_grid(self, grid: np.array) -> None:
-        self.print_grid(grid.tolist())
+    @staticmethod
+    def print_np_grid(grid: np.array) -> None:
+        Grider.print_grid(grid.tolist())
+
+
+def read_cells(f: BinaryIO, n: int | None = None) -> Iterator[bytes]:
+    """Yield the n * n cells of each puzzle of a file opened in binary mode.
+
+    The puzzles are written either one per line, or as n rows of n cells
+    in the format of parse_grid(), one after the other. Comments and empty
+    lines are skipped. Without n, the side is taken from the first line:
+    a line of m * m cells with m even and at least 6 is a whole puzzle,
+    any other line is the first row of a grid. Raise ValueError on lines
+    of another length or a truncated last grid."""
+
+    rows = []
+    for lineno, line in enumerate(f, 1):
+        line = line.strip()
+        if not line or line.startswith(b"#"):
+            continue
+        if n is None:
+            m = isqrt(len(line))
+            n = m if m * m == len(line) and m % 2 == 0 and m >= 6 else len(line)
+        if len(line) == n * n and not rows:
+            yield line
+        elif len(line) == n:
+            rows.append(line)
+            if len(rows) == n:
+                yield b"".join(rows)
+                rows = []
+        else:
+            raise ValueError(f"line {lineno}: {len(line)} cells, expected {n}")
+    if rows:
+        raise ValueError(f"the last grid has {len(rows)} of {n} rows")
+
+
+def to_np(grid: list[list[str]]) -> np.ndarray:
+    """Return a grid as read by Grider as an array, "" for empty cells."""
+    g = np.array(grid)
+    g[g == " "] = ""
+    return g
+
+
+def save_grid(filename: str, grid: list[list[str]], comment: str = "") -> None:
+    """Write a grid in the text format read by Grider, - for empty cells."""
+
+    with open(filename, "w") as f:
+        if comment:
+            f.write(f"# {comment}\n\n")
+        for row in grid:
+            f.write("".join(c if c in ("o", "x") else "-" for c in row) + "\n")
+
+
+def encode(grid: np.ndarray) -> np.ndarray:
+    """Turn a grid as returned by Grider.as_np() into a uint8 grid."""
+    return (grid == "o") * np.uint8(O) + (grid == "x") * np.uint8(X)
+
+
+def decode(grid: np.ndarray) -> np.ndarray:
+    """Turn a uint8 grid back into the format of Grider.as_np()."""
+    return np.array(["", "o", "x"])[grid]
+
+
+def uniqueness(nb_solutions: int) -> str:
+    """Classify a number of solutions as none, unique or multiple."""
+    return ["none", "unique"][nb_solutions] if nb_solutions < 2 else "multiple"
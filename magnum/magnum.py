@@ -4,54 +4,326 @@
 Magnum Popsiscle Calculator
 """
 
+import argparse
+import csv
 import math
+import sys
+import time
+from collections.abc import Iterator
+from itertools import combinations, islice
+from typing import TextIO
 
-classic = 41.5
-almond = 44.3
-white = 41.3
+import numpy as np
 
-weights = [classic, almond, white]
+# Weight of each popsicle.
+FLAVOURS = {"classic": 41.5, "almond": 44.3, "white": 41.3}
 
-pkg_weight = 336.8
-nb_pops = 8
+# Weight of package.
+PKG_WEIGHT = 336.8
 
-# Variant 1: we brute force over all triplets, knowing that some
-# are not valid.
+# Nb of popsicles per package.
+NB_POPS = 8
 
-c = 0
-for i in range(1, nb_pops - 1):
-    for j in range(1, nb_pops - 1):
-        for k in range(1, nb_pops - 1):
+
+def variant1(weights: list[float], pkg_weight: float, nb_pops: int) -> None:
+    """Variant 1: we brute force over all triplets, knowing that some
+    are not valid."""
+
+    c = 0
+    for i in range(1, nb_pops - 1):
+        for j in range(1, nb_pops - 1):
+            for k in range(1, nb_pops - 1):
+                c += 1
+                counts = [i, j, k]
+                # Max number of popsicles must match.
+                if sum(counts) == nb_pops:
+                    computed_weights = sum(x * y for x, y in zip(counts, weights))
+                    res = ""
+                    if math.isclose(computed_weights, pkg_weight):
+                        res = " --! bingo !--"
+
+                    print(
+                        f"classic, almond, white = {i} {j} {k} {computed_weights:5.1f}"
+                        f" {computed_weights-pkg_weight:5.2f} {res}"
+                    )
+    print(f"total = {c}")
+
+
+def variant2(weights: list[float], pkg_weight: float, nb_pops: int) -> None:
+    """Variant 2: we compute only valid triplets by changing the limits of
+    the second range and computing the third quantity to match the total.
+    We only need to check the weight."""
+
+    c = 0
+    for i in range(1, nb_pops - 1):
+        for j in range(1, nb_pops - i):
             c += 1
-            counts = [i, j, k]
-            # Max number of popsicles must match.
-            if sum(counts) == nb_pops:
-                computed_weights = sum(x * y for x, y in zip(counts, weights))
-                res = ""
-                if math.isclose(computed_weights, pkg_weight):
-                    res = " --! bingo !--"
+            counts = [i, j, nb_pops - i - j]
+            computed_weights = sum(x * y for x, y in zip(counts, weights))
+            res = ""
+            if math.isclose(computed_weights, pkg_weight):
+                res = " --! bingo !--"
+            print(
+                f"classic, almond, white = {i} {j} {nb_pops-i-j} {computed_weights:5.1f}"
+                f" {computed_weights-pkg_weight:5.2f} {res}"
+            )
+    print(f"total = {c}")
+
+
+def decigrams(weight: float) -> int:
+    """Weights are given to the tenth of a gram, count them as integers."""
+    return round(weight * 10)
+
+
+def reachable(
+    weights: list[int], nb_pops: int, limit: int, minimum: int = 1
+) -> list[list[int]]:
+    """Return layers, where bit w of layers[i][k] is set if k popsicles of
+    the first i flavours, at least minimum of each, weigh w. Weights are
+    integers, totals above limit are dropped."""
+
+    full = (1 << (limit + 1)) - 1
+    layers = [[1] + [0] * nb_pops]
+    for weight in weights:
+        prev = layers[-1]
+        layer = [0] * (nb_pops + 1)
+        for k in range(minimum, nb_pops + 1):
+            # minimum of this flavour on top of the previous ones, or one
+            # more than for k - 1 popsicles
+            layer[k] = prev[k - minimum] << (minimum * weight)
+            if k > minimum:
+                layer[k] |= layer[k - 1] << weight
+            layer[k] &= full
+        layers.append(layer)
+    return layers
+
+
+def compositions(
+    weights: list[float],
+    nb_pops: int,
+    pkg_weight: float,
+    tolerance: float = 0.0,
+    minimum: int = 1,
+) -> Iterator[tuple[int, ...]]:
+    """Yield the counts per flavour of every package of nb_pops popsicles,
+    at least minimum of each flavour, whose weight is pkg_weight within
+    tolerance.
+
+    The weights are counted in decigrams. A table of the reachable weights
+    per number of flavours and popsicles is built first, see reachable(),
+    then only the counts that lead to a solution are followed, so the time
+    grows with the number of flavours times popsicles times weight, plus
+    the number of solutions, not with the number of all compositions."""
+
+    weights = [decigrams(w) for w in weights]
+    low, high = decigrams(pkg_weight - tolerance), decigrams(pkg_weight + tolerance)
+    layers = reachable(weights, nb_pops, high, minimum)
+
+    def search(i: int, k: int, w: int, counts: list[int]) -> Iterator[tuple[int]]:
+        if i == 0:
+            yield tuple(reversed(counts))
+            return
+        for c in range(minimum, k + 1):
+            rest = w - c * weights[i - 1]
+            if rest < 0:
+                break
+            if layers[i - 1][k - c] >> rest & 1:
+                yield from search(i - 1, k - c, rest, counts + [c])
+
+    total = layers[-1][nb_pops]
+    for w in range(max(low, 0), high + 1):
+        if total >> w & 1:
+            yield from search(len(weights), nb_pops, w, [])
+
+
+def all_compositions(nb_flavours: int, nb_pops: int, minimum: int = 1) -> np.ndarray:
+    """Return the counts of every package of nb_pops popsicles with at
+    least minimum of each flavour, one row per package: the free
+    popsicles are split by nb_flavours - 1 bars (stars and bars)."""
+
+    free = nb_pops - nb_flavours * minimum
+    if free < 0:
+        return np.zeros((0, nb_flavours), dtype=np.int64)
+    if nb_flavours == 1:
+        # no bar to place, reshape() cannot infer the rows of a 0-wide array
+        return np.array([[nb_pops]], dtype=np.int64)
+    slots = free + nb_flavours - 1
+    bars = np.array(
+        list(combinations(range(slots), nb_flavours - 1)), dtype=np.int64
+    ).reshape(-1, nb_flavours - 1)
+    edges = np.hstack(
+        [np.full((len(bars), 1), -1), bars, np.full((len(bars), 1), slots)]
+    )
+    return np.diff(edges, axis=1) - 1 + minimum
+
+
+class WeightIndex:
+
+    def __init__(self, weights: list[float], nb_pops: int, minimum: int = 1):
+        """Compute the weight of every package of nb_pops popsicles of the
+        catalogue, in decigrams, sorted, with their counts per flavour."""
 
+        counts = all_compositions(len(weights), nb_pops, minimum)
+        totals = counts @ np.array([decigrams(w) for w in weights], dtype=np.int64)
+        order = np.argsort(totals, kind="stable")
+        self.totals, self.counts = totals[order], counts[order]
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def lookup(
+        self, measured: list[float] | np.ndarray, tolerance: float = 0.0
+    ) -> list[list[tuple[tuple[int, ...], float]]]:
+        """Return, for each measured weight, the counts of the packages
+        within tolerance and their error in grams, smallest error first.
+        The bounds of all the windows are found with one binary search."""
+
+        measured = np.rint(np.asarray(measured, dtype=float) * 10).astype(np.int64)
+        tol = decigrams(tolerance)
+        lows = np.searchsorted(self.totals, measured - tol, side="left")
+        highs = np.searchsorted(self.totals, measured + tol, side="right")
+
+        candidates = []
+        for m, low, high in zip(measured, lows, highs):
+            errors = self.totals[low:high] - m
+            ranked = np.argsort(np.abs(errors), kind="stable")
+            candidates.append(
+                [
+                    (tuple(self.counts[low + i].tolist()), int(errors[i]) / 10)
+                    for i in ranked
+                ]
+            )
+        return candidates
+
+
+def read_weights(f: TextIO) -> Iterator[float]:
+    """Yield the weights of a CSV, from the column weight if the first row
+    is a header, else from the first column. Rows without a weight are
+    reported on stderr and skipped."""
+
+    column = 0
+    seen = False
+    reader = csv.reader(f)
+    for row in reader:
+        if not row or row[0].startswith("#"):
+            continue
+        try:
+            weight = float(row[column])
+        except (ValueError, IndexError):
+            weight = None
+            # only the first row read, comments aside, can be a header
+            if not seen:
+                column = row.index("weight") if "weight" in row else 0
+            else:
                 print(
-                    f"classic, almond, white = {i} {j} {k} {computed_weights:5.1f}"
-                    f" {computed_weights-pkg_weight:5.2f} {res}"
+                    f"line {reader.line_num}: no weight in {','.join(row)}, skipped",
+                    file=sys.stderr,
                 )
-print(f"total = {c}")
+        seen = True
+        if weight is not None:
+            yield weight
+
+
+def check(
+    index: WeightIndex, names: list[str], f: TextIO, tolerance: float, batch: int
+) -> None:
+    """Write the candidates of each weight read from f as CSV, ranked by
+    error. Weights are looked up batch at a time."""
+
+    out = csv.writer(sys.stdout, lineterminator="\n")
+    out.writerow(["weight", "rank", *names, "error"])
+    weights = read_weights(f)
+    while chunk := list(islice(weights, batch)):
+        for weight, candidates in zip(chunk, index.lookup(chunk, tolerance)):
+            if not candidates:
+                out.writerow([weight, 0, *[""] * len(names), ""])
+            for rank, (counts, error) in enumerate(candidates, 1):
+                out.writerow([weight, rank, *counts, f"{error:.1f}"])
+        sys.stdout.flush()
+
 
-# Variant 2: we compute only valid triplets by changing
-# the limits of the second range and computing the third quantity
-# to match the total. We only need to check the weight.
+def flavour(text: str) -> tuple[str, float]:
+    """Parse name=weight."""
+    name, _, weight = text.partition("=")
+    return name, float(weight)
 
-c = 0
-for i in range(1, nb_pops - 1):
-    for j in range(1, nb_pops - i):
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-f",
+        "--flavour",
+        type=flavour,
+        action="append",
+        help="flavour as name=weight, default: "
+        + " ".join(f"{k}={v}" for k, v in FLAVOURS.items()),
+    )
+    parser.add_argument(
+        "-w", "--weight", type=float, default=PKG_WEIGHT, help="package weight"
+    )
+    parser.add_argument(
+        "-n", "--nb-pops", type=int, default=NB_POPS, help="popsicles per package"
+    )
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=0.0, help="weight tolerance"
+    )
+    parser.add_argument(
+        "-m", "--minimum", type=int, default=1, help="minimum count per flavour"
+    )
+    parser.add_argument(
+        "-c",
+        "--check",
+        metavar="CSV",
+        help="look up the package weights of a CSV file, - for stdin, "
+        "in the index of all packages",
+    )
+    parser.add_argument(
+        "--brute",
+        action="store_true",
+        help="run the two brute force variants, three flavours only",
+    )
+
+    args = parser.parse_args()
+
+    flavours = dict(args.flavour) if args.flavour else FLAVOURS
+    names, weights = list(flavours), list(flavours.values())
+
+    if args.brute:
+        variant1(weights, args.weight, args.nb_pops)
+        variant2(weights, args.weight, args.nb_pops)
+        return
+
+    if args.check:
+        start = time.perf_counter()
+        index = WeightIndex(weights, args.nb_pops, args.minimum)
+        print(
+            f"indexed {len(index)} packages in {time.perf_counter() - start:.3f} s",
+            file=sys.stderr,
+        )
+        if args.check == "-":
+            check(index, names, sys.stdin, args.tolerance, 1)
+        else:
+            with open(args.check, newline="") as f:
+                check(index, names, f, args.tolerance, 4096)
+        return
+
+    start = time.perf_counter()
+    c = 0
+    for counts in compositions(
+        weights, args.nb_pops, args.weight, args.tolerance, args.minimum
+    ):
         c += 1
-        counts = [i, j, nb_pops - i - j]
         computed_weights = sum(x * y for x, y in zip(counts, weights))
-        res = ""
-        if math.isclose(computed_weights, pkg_weight):
-            res = " --! bingo !--"
         print(
-            f"classic, almond, white = {i} {j} {nb_pops-i-j} {computed_weights:5.1f}"
-            f" {computed_weights-pkg_weight:5.2f} {res}"
+            f"{', '.join(names)} = {' '.join(map(str, counts))} "
+            f"{computed_weights:5.1f} {computed_weights - args.weight:5.2f}"
         )
-print(f"total = {c}")
+    print(f"total = {c} in {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
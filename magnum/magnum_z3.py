@@ -4,44 +4,122 @@
 Solving the Magnum Problem with z3.
 """
 
-from z3 import Int, Solver, sat
+import argparse
+import json
+import time
 
-# Weight of each popsicle.
-classic = 41.5
-almond = 44.3
-white = 41.3
+from z3 import Int, Or, SolverFor, Sum, sat
 
-# Weight of package.
-pkg_weight = 336.8
+from magnum import FLAVOURS, NB_POPS, PKG_WEIGHT, decigrams, flavour
 
-# Nb of popsicles per package.
-nb_pop = 8
 
-nb_classic = Int("nb_classic")
-nb_almond = Int("nb_almond")
-nb_white = Int("nb_white")
+class Magnum:
 
-solver = Solver()
+    def __init__(self, weights: list[float], nb_pops: int, minimum: int = 1):
+        """Model the packages of nb_pops popsicles with at least minimum
+        of each flavour. The weights are counted in decigrams, so the model
+        is in integer arithmetic only."""
 
-# Constraints to enforce at least one of each.
-solver.add(nb_classic > 0)
-solver.add(nb_almond > 0)
-solver.add(nb_white > 0)
+        self.weights = [decigrams(w) for w in weights]
+        self.counts = [Int(f"nb_{i}") for i in range(len(weights))]
 
-# Constraint for the total number of popsicles.
-solver.add(nb_classic + nb_almond + nb_white == nb_pop)
+        self.solver = SolverFor("QF_LIA")
 
-# Constraints for the total weight.
-solver.add(classic * nb_classic + almond * nb_almond + white * nb_white == pkg_weight)
+        # Constraints to enforce at least minimum of each.
+        for c in self.counts:
+            self.solver.add(c >= minimum)
 
-# Solve and get the first solution.
-if solver.check() == sat:
-    
-    model = solver.model()
-    
-    # stats = solver.statistics()
+        # Constraint for the total number of popsicles.
+        self.solver.add(Sum(self.counts) == nb_pops)
 
-    print(f"classic, almond, white = "
-          f"{model.eval(nb_classic)}, "
-          f"{model.eval(nb_almond)}, "
-          f"{model.eval(nb_white)}")
+        self.total = Sum([w * c for w, c in zip(self.weights, self.counts)])
+        self.last_stats = None
+
+    def solutions(
+        self, pkg_weight: float, tolerance: float = 0.0, cap: int = 0
+    ) -> list[tuple[int, ...]]:
+        """Return the counts of every package whose weight is pkg_weight
+        within tolerance, stopping at cap unless it is 0. Each model found
+        is blocked, the weight band and the blocking clauses are dropped
+        with pop() so the solver can be asked again."""
+
+        self.solver.push()
+        try:
+            # Constraints for the total weight.
+            self.solver.add(self.total >= decigrams(pkg_weight - tolerance))
+            self.solver.add(self.total <= decigrams(pkg_weight + tolerance))
+
+            found = []
+            while (not cap or len(found) < cap) and self.solver.check() == sat:
+                model = self.solver.model()
+                counts = tuple(model.eval(c).as_long() for c in self.counts)
+                found.append(counts)
+                self.solver.add(Or([c != n for c, n in zip(self.counts, counts)]))
+            self.last_stats = self.solver.statistics()
+            return found
+        finally:
+            self.solver.pop()
+
+    def statistics(self) -> dict:
+        """Return the solver statistics of the last call to solutions()."""
+        stats = self.last_stats
+        return {key: stats.get_key_value(key) for key in stats.keys()}
+
+
+def main() -> None:
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "-f",
+        "--flavour",
+        type=flavour,
+        action="append",
+        help="flavour as name=weight, default: "
+        + " ".join(f"{k}={v}" for k, v in FLAVOURS.items()),
+    )
+    parser.add_argument(
+        "-w", "--weight", type=float, default=PKG_WEIGHT, help="package weight"
+    )
+    parser.add_argument(
+        "-n", "--nb-pops", type=int, default=NB_POPS, help="popsicles per package"
+    )
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=0.0, help="weight tolerance"
+    )
+    parser.add_argument(
+        "-m", "--minimum", type=int, default=1, help="minimum count per flavour"
+    )
+    parser.add_argument(
+        "-a",
+        "--all",
+        type=int,
+        nargs="?",
+        const=0,
+        default=1,
+        metavar="CAP",
+        help="get all the solutions, stopping at CAP if given",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", help="print the solver statistics as JSON"
+    )
+
+    args = parser.parse_args()
+
+    flavours = dict(args.flavour) if args.flavour else FLAVOURS
+    names = list(flavours)
+
+    start = time.perf_counter()
+    magnum = Magnum(list(flavours.values()), args.nb_pops, args.minimum)
+    found = magnum.solutions(args.weight, args.tolerance, args.all)
+    for counts in found:
+        print(f"{', '.join(names)} = {', '.join(map(str, counts))}")
+    print(f"total = {len(found)} in {time.perf_counter() - start:.3f} s")
+    if args.stats:
+        print(json.dumps(magnum.statistics(), indent=1))
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass